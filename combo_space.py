@@ -0,0 +1,177 @@
+# combo_space.py
+"""Pick-N combo generation over the box space (no Streamlit imports).
+
+A box combo is a sorted digit string, so the whole space for ``n`` digits
+is ``combinations_with_replacement('0123456789', n)`` -- C(n+9, 9) entries,
+already in sorted order.  Every generation method is a set of digit
+multisets, and its pool is the combos containing any of them.  Small spaces
+answer that with bitmap unions/intersections over a cached ``BoxTable``;
+large ones are enumerated lazily in chunks.  Neither builds
+``product(..., repeat=n-1)`` sets and sorts them.
+"""
+from collections import Counter
+from itertools import chain, combinations_with_replacement, islice
+from math import comb
+
+from shared_cache import LRUCache
+
+ALL_DIGITS = '0123456789'
+DEFAULT_COMBO_LEN = 5
+CHUNK_SIZE = 10_000
+# Largest box space kept as an in-memory BoxTable (Pick-8 is 24,310 combos)
+MAX_TABLE_SIZE = 100_000
+
+
+def box_space_size(n: int = DEFAULT_COMBO_LEN) -> int:
+    return comb(n + 9, 9)
+
+
+def iter_box_space(n: int = DEFAULT_COMBO_LEN):
+    """Every ``n``-digit box combo as a sorted string, in sorted order."""
+    for digits in combinations_with_replacement(ALL_DIGITS, n):
+        yield ''.join(digits)
+
+
+def normalize_seed(seed: str, n: int = DEFAULT_COMBO_LEN) -> str:
+    seed_only = ''.join(ch for ch in seed if ch.isdigit())
+    if len(seed_only) != n:
+        seed_only = seed_only.zfill(n)
+    return ''.join(sorted(seed_only))
+
+
+def _pairs(digits: str) -> set:
+    return {
+        ''.join(sorted((digits[i], digits[j])))
+        for i in range(len(digits)) for j in range(i + 1, len(digits))
+    }
+
+
+def _bucket(digits: str) -> str:
+    return ''.join(sorted(set(ch for ch in (digits or '') if ch.isdigit())))
+
+
+def method_multisets(seed: str, method: str, bucket_digits: str = "",
+                     n: int = DEFAULT_COMBO_LEN, bucket_b: str = "") -> list:
+    """The digit multisets a combo must contain (any one of them) to be in the pool.
+
+    Generation methods:
+      - '1-digit'            : one of the original seed digits + n-1 free digits
+      - '2-digit pair'       : a pair from the original seed digits + n-2 free digits
+      - '1-digit (+1)'       : one of (seed digits +1 mod 10) + n-1 free digits
+      - '2-digit pair (+1)'  : a pair from (seed digits +1 mod 10) + n-2 free digits
+      - 'Bucket (1+4)'       : each bucket digit + any n-1 digits (with repetition)
+      - 'Bucket A1 + B2 + AllBoxPairs'
+                             : one bucket-A digit + a box pair of bucket-B digits
+                               (with repetition) + all box pairs for the other n-3 digits
+
+    Each multiset is a sorted digit string; the pool is every box combo that
+    contains at least one of them (multiset containment), so the free digits
+    never have to be enumerated.
+    """
+    sorted_seed = normalize_seed(seed, n)
+    shifted = ''.join(str((int(d) + 1) % 10) for d in sorted_seed)
+
+    if method in ('1-digit', '1-digit (+1)'):
+        return sorted(set(sorted_seed if method == '1-digit' else shifted))
+    if method in ('2-digit pair', '2-digit pair (+1)'):
+        return sorted(_pairs(sorted_seed if method == '2-digit pair' else shifted))
+    if method == 'Bucket (1+4)':
+        return list(_bucket(bucket_digits))
+    if method == 'Bucket A1 + B2 + AllBoxPairs':
+        b_pairs = [''.join(p) for p in combinations_with_replacement(_bucket(bucket_b), 2)]
+        return sorted({''.join(sorted(a + pair)) for a in _bucket(bucket_digits) for pair in b_pairs})
+    raise ValueError(f"Unknown method: {method}")
+
+
+def _needs(multisets) -> list:
+    """``'113'`` -> ``(('1', 2), ('3', 1))``: per-digit minimum counts."""
+    return [tuple(sorted(Counter(ms).items())) for ms in multisets]
+
+
+def method_predicate(seed: str, method: str, bucket_digits: str = "",
+                     n: int = DEFAULT_COMBO_LEN, bucket_b: str = ""):
+    """Return ``contains(combo) -> bool`` for ``method``, or None for an empty pool."""
+    needs = [need for need in _needs(method_multisets(seed, method, bucket_digits, n, bucket_b))
+             if sum(k for _, k in need) <= n]
+    if not needs:
+        return None
+    return lambda combo: any(all(combo.count(d) >= k for d, k in need) for need in needs)
+
+
+class BoxTable:
+    """The ``n``-digit box space with per-digit count bitmaps.
+
+    ``at_least[d][k]`` has bit ``i`` set when ``combos[i]`` holds digit ``d``
+    at least ``k`` times, so a containment test for a whole multiset is an
+    AND of at most ``n`` ints and a method's pool is an OR over its multisets.
+    """
+
+    def __init__(self, n: int = DEFAULT_COMBO_LEN):
+        self.n = n
+        self.combos = tuple(iter_box_space(n))
+        rows = [[bytearray(b'0' * len(self.combos)) for _ in range(n + 1)] for _ in ALL_DIGITS]
+        for i, combo in enumerate(self.combos):
+            for d, k in Counter(combo).items():
+                flags = rows[int(d)]
+                for j in range(1, k + 1):
+                    flags[j][i] = 0x31  # b'1'
+        everything = (1 << len(self.combos)) - 1
+        self.at_least = [[everything] + [int(bytes(flags[::-1]), 2) for flags in per_digit[1:]]
+                         for per_digit in rows]
+
+    def contains_bits(self, need) -> int:
+        """Bitmap of combos containing the multiset ``need`` (from ``_needs``)."""
+        bits = self.at_least[0][0]
+        for d, k in need:
+            if k > self.n:
+                return 0
+            bits &= self.at_least[int(d)][k]
+        return bits
+
+    def pool_bits(self, multisets) -> int:
+        bits = 0
+        for need in _needs(multisets):
+            bits |= self.contains_bits(need)
+        return bits
+
+    def select(self, bits: int) -> list:
+        """Combos whose bit is set, in box-space (sorted) order."""
+        flags = bin(bits)[:1:-1]
+        return [self.combos[i] for i, flag in enumerate(flags) if flag == '1']
+
+
+# One BoxTable per Pick-N, shared by every session of the process
+BOX_TABLES = LRUCache('box_tables', max_entries=4)
+
+
+def box_table(n: int = DEFAULT_COMBO_LEN) -> BoxTable:
+    """Shared ``BoxTable`` for ``n`` digits; built once per process."""
+    return BOX_TABLES.get_or_create(n, lambda: BoxTable(n))
+
+
+def iter_combinations(seed: str, method: str, bucket_digits: str = "",
+                      n: int = DEFAULT_COMBO_LEN, chunk_size: int = CHUNK_SIZE, bucket_b: str = ""):
+    """Yield the pool for ``method`` lazily, as sorted lists of at most ``chunk_size`` combos."""
+    contains = method_predicate(seed, method, bucket_digits, n, bucket_b)
+    if contains is None:
+        return
+    pool = (combo for combo in iter_box_space(n) if contains(combo))
+    while True:
+        chunk = list(islice(pool, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def generate_combinations(seed: str, method: str, bucket_digits: str = "",
+                          n: int = DEFAULT_COMBO_LEN, bucket_b: str = "") -> list:
+    """The whole pool as a sorted list; only for pools small enough to hold in memory.
+
+    Box spaces up to ``MAX_TABLE_SIZE`` are answered from the cached
+    ``BoxTable`` by bitmap algebra; larger ones fall back to the predicate.
+    """
+    multisets = method_multisets(seed, method, bucket_digits, n, bucket_b)
+    if box_space_size(n) <= MAX_TABLE_SIZE:
+        table = box_table(n)
+        return table.select(table.pool_bits(multisets))
+    return list(chain.from_iterable(iter_combinations(seed, method, bucket_digits, n, bucket_b=bucket_b)))
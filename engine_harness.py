@@ -0,0 +1,432 @@
+# engine_harness.py
+"""Differential equivalence and throughput harness for filter engines (no Streamlit imports).
+
+Runs several evaluation engines over the same seeds and filter CSVs and
+compares their per-filter hit sets combo by combo:
+
+  legacy     the 1-series tester as it shipped: an eager context dict per
+             combo, ``sum_category`` cut-offs 15/24/33, raw ``eval(code, ctx, ctx)``
+  sandboxed  the 3-series tester: cut-offs 14/20/26, ``ALLOWED_BUILTINS``
+             sandbox (``eval(code, {"__builtins__": ...}, ctx)``) and its own
+             context keys (``mirrir``, ``VTRAC_GROUP``, ``sum_category`` ...)
+  optimized  ``filter_engine``: lazy two-layer contexts, per-filter bitmaps
+  sharded    ``filter_engine.evaluate_sharded`` across a process pool
+
+The reference engines share no code with ``filter_engine``: the 1-series
+``gen_ctx``, ``sum_category`` and ``structure_of`` are frozen copies of the
+baseline tester, and the 3-series app module does not import (it is not
+valid Python), so its semantics are re-declared here too.  All engines
+evaluate the same compiled code objects from ``filter_loader``, so
+differences come from the engines alone.
+
+    python engine_harness.py --seeds 27483 01234 --filters lottery_filters_batch10.csv
+
+Exits with status 1 when any engine named by ``--require-identical`` disagrees
+with the reference engine.
+"""
+import argparse
+import csv
+import math
+import sys
+import time
+from collections import Counter
+
+from combo_space import generate_combinations
+from filter_engine import evaluate_sharded, filter_hits, iter_bits, make_gen_ctx
+from filter_loader import compile_filter_file
+
+# ---------- Frozen tables and helpers (identical in both tester generations) ----------
+
+V_TRAC_GROUPS = {0:1,5:1,1:2,6:2,2:3,7:3,3:4,8:4,4:5,9:5}
+MIRROR_PAIRS = {0:5,5:0,1:6,6:1,2:7,7:2,3:8,8:3,4:9,9:4}
+MIRROR = MIRROR_PAIRS
+
+
+def structure_of(digits):
+    counts = sorted(Counter(digits).values(), reverse=True)
+    if counts == [1,1,1,1,1]:
+        return 'SINGLE'
+    if counts == [2,1,1,1]:
+        return 'DOUBLE'
+    if counts == [2,2,1]:
+        return 'DOUBLE-DOUBLE'
+    if counts == [3,1,1]:
+        return 'TRIPLE'
+    if counts == [3,2]:
+        return 'TRIPLE-DOUBLE'
+    if counts == [4,1]:
+        return 'QUAD'
+    if counts == [5]:
+        return 'QUINT'
+    return f'OTHER-{counts}'
+
+
+# ---------- 3-series semantics ----------
+
+ALLOWED_BUILTINS = {
+    "len": len, "sum": sum, "any": any, "all": all,
+    "set": set, "range": range, "sorted": sorted,
+    "min": min, "max": max, "abs": abs, "round": round,
+    "int": int, "float": float, "str": str, "bool": bool,
+    "tuple": tuple, "list": list, "dict": dict,
+    "zip": zip, "map": map, "enumerate": enumerate,
+    "Counter": Counter,
+    "math": math,
+}
+
+
+def sum_category_v3(total: int) -> str:
+    if 0 <= total <= 14:
+        return 'Very Low'
+    elif 15 <= total <= 20:
+        return 'Low'
+    elif 21 <= total <= 26:
+        return 'Mid'
+    else:
+        return 'High'
+
+
+def make_gen_ctx_v3(seed_inputs: dict):
+    """``gen_ctx`` of the 3-series tester (eager dict per combo)."""
+    seed = seed_inputs['seed']
+    seed_digits = [int(d) for d in seed]
+    prev_digits = seed_inputs['prev_digits']
+    prev_prev_digits = seed_inputs['prev_prev_digits']
+    prev_prev_prev_digits = seed_inputs['prev_prev_prev_digits']
+    due_digits = seed_inputs['due_digits']
+    if due_digits is None:
+        due_digits = [d for d in range(10) if d not in prev_digits and d not in prev_prev_digits]
+    seed_sum = sum(seed_digits)
+    prev_pattern = []
+    for digs in (prev_prev_digits, prev_digits, seed_digits):
+        parity = 'Even' if sum(digs) % 2 == 0 else 'Odd'
+        prev_pattern.extend([sum_category_v3(sum(digs)), parity])
+    prev_pattern = tuple(prev_pattern)
+
+    def gen_ctx(cdigits):
+        csum = sum(cdigits)
+        return {
+            'seed_value': int(seed),
+            'seed_sum': seed_sum,
+            'seed_sum_last_digit': seed_sum % 10,
+            'prev_seed_sum': sum(prev_digits) if prev_digits else None,
+            'prev_prev_seed_sum': sum(prev_prev_digits) if prev_prev_digits else None,
+            'prev_prev_prev_seed_sum': sum(prev_prev_prev_digits) if prev_prev_prev_digits else None,
+            'seed_digits_1': prev_digits,
+            'seed_digits_2': prev_prev_digits,
+            'seed_digits_3': prev_prev_prev_digits,
+            'nan': float('nan'),
+            'seed_digits': seed_digits,
+            'prev_seed_digits': prev_digits,
+            'prev_prev_seed_digits': prev_prev_digits,
+            'prev_prev_prev_seed_digits': prev_prev_prev_digits,
+            'new_seed_digits': set(seed_digits) - set(prev_digits),
+            'prev_pattern': prev_pattern,
+            'hot_digits': seed_inputs['hot_digits'],
+            'cold_digits': seed_inputs['cold_digits'],
+            'due_digits': due_digits,
+            'seed_counts': Counter(seed_digits),
+            'combo_digits': cdigits,
+            'combo_sum': csum,
+            'combo_sum_cat': sum_category_v3(csum),
+            'seed_vtracs': set(V_TRAC_GROUPS[d] for d in seed_digits),
+            'combo_vtracs': set(V_TRAC_GROUPS[d] for d in cdigits),
+            'MIRROR': MIRROR, 'mirror': MIRROR, 'mirrir': MIRROR, 'MIRROR_PAIRS': MIRROR_PAIRS,
+            'V_TRAC_GROUPS': V_TRAC_GROUPS, 'VTRAC_GROUPS': V_TRAC_GROUPS,
+            'V_TRAC': V_TRAC_GROUPS, 'VTRAC_GROUP': V_TRAC_GROUPS, 'vtrac': V_TRAC_GROUPS,
+            'common_to_both': set(seed_digits) & set(prev_digits),
+            'last2': set(seed_digits) | set(prev_digits),
+            'Counter': Counter,
+            'combo_structure': structure_of(cdigits),
+            'winner_structure': structure_of(seed_digits),
+            'sum_category': sum_category_v3,
+            'structure_of': structure_of,
+        }
+    return gen_ctx
+
+
+# ---------- 1-series semantics (frozen copy of the baseline tester) ----------
+
+def sum_category_v1(total: int) -> str:
+    if 0 <= total <= 15:
+        return 'Very Low'
+    elif 16 <= total <= 24:
+        return 'Low'
+    elif 25 <= total <= 33:
+        return 'Mid'
+    else:
+        return 'High'
+
+
+def make_gen_ctx_legacy(seed_inputs: dict):
+    """``gen_ctx`` of the original 1-series tester: a fresh eager dict per combo."""
+    seed = seed_inputs['seed']
+    seed_digits = [int(d) for d in seed]
+    prev_digits = seed_inputs['prev_digits']
+    prev_prev_digits = seed_inputs['prev_prev_digits']
+    prev_prev_prev_digits = seed_inputs['prev_prev_prev_digits']
+    new_digits = set(seed_digits) - set(prev_digits)
+    hot_digits = seed_inputs['hot_digits']
+    cold_digits = seed_inputs['cold_digits']
+    due_digits = seed_inputs['due_digits']
+    if due_digits is None:
+        due_digits = [d for d in range(10) if d not in prev_digits and d not in prev_prev_digits]
+
+    seed_counts = Counter(seed_digits)
+    seed_sum = sum(seed_digits)
+    prev_pattern = []
+    for digs in (prev_prev_digits, prev_digits, seed_digits):
+        parity = 'Even' if sum(digs) % 2 == 0 else 'Odd'
+        prev_pattern.extend([sum_category_v1(sum(digs)), parity])
+    prev_pattern = tuple(prev_pattern)
+
+    def gen_ctx(cdigits):
+        csum = sum(cdigits)
+        ctx = {
+            "seed_value": int(seed),
+            "seed_sum": seed_sum,
+            "prev_seed_sum": sum(prev_digits) if prev_digits else None,
+            "prev_prev_seed_sum": sum(prev_prev_digits) if prev_prev_digits else None,
+            "prev_prev_prev_seed_sum": sum(prev_prev_prev_digits) if prev_prev_prev_digits else None,
+
+            "seed_digits_1": prev_digits,
+            "seed_digits_2": prev_prev_digits,
+            "seed_digits_3": prev_prev_prev_digits,
+
+            "nan": float("nan"),
+
+            "seed_digits": seed_digits,
+            "prev_seed_digits": prev_digits,
+            "prev_prev_seed_digits": prev_prev_digits,
+            "prev_prev_prev_seed_digits": prev_prev_prev_digits,
+
+            "new_seed_digits": new_digits,
+            "prev_pattern": prev_pattern,
+
+            "hot_digits": hot_digits,
+            "cold_digits": cold_digits,
+            "due_digits": due_digits,
+
+            "seed_counts": seed_counts,
+            "combo_digits": cdigits,
+            "combo_sum": csum,
+            "combo_sum_cat": sum_category_v1(csum),
+
+            "seed_vtracs": set(V_TRAC_GROUPS[d] for d in seed_digits),
+            "combo_vtracs": set(V_TRAC_GROUPS[d] for d in cdigits),
+
+            "common_to_both": set(seed_digits) & set(prev_digits),
+            "last2": set(seed_digits) | set(prev_digits),
+
+            "Counter": Counter,
+            "combo_structure": structure_of(cdigits),
+            "winner_structure": structure_of(seed_digits),
+
+            "MIRROR": MIRROR,
+            "mirror": MIRROR,
+            "MIRROR_PAIRS": MIRROR_PAIRS,
+
+            "V_TRAC_GROUPS": V_TRAC_GROUPS,
+            "VTRAC_GROUPS": V_TRAC_GROUPS,
+            "V_TRAC": V_TRAC_GROUPS,
+            "vtrac": V_TRAC_GROUPS,
+
+            "digit_prev_letters": {},
+            "digit_current_letters": {},
+            "prev_core_letters": set(),
+            "core_letters_prevmap": [],
+
+            "applicable_if": True,
+        }
+        return ctx
+    return gen_ctx
+
+
+# ---------- Engines: (combos, filters, seed_inputs) -> (hits, errors) ----------
+
+def _bitmaps(combos, filters, contexts, run):
+    hits, errors = [], []
+    for flt in filters:
+        flags = bytearray(b'0' * len(contexts))
+        err_flags = bytearray(b'0' * len(contexts))
+        for i, ctx in enumerate(contexts):
+            try:
+                if run(flt['applicable_code'], ctx) and run(flt['expr_code'], ctx):
+                    flags[i] = 0x31
+            except Exception:
+                err_flags[i] = 0x31
+        hits.append(int(bytes(reversed(flags)) or b'0', 2))
+        errors.append(int(bytes(reversed(err_flags)) or b'0', 2))
+    return hits, errors
+
+
+def run_legacy(combos, filters, seed_inputs):
+    gen_ctx = make_gen_ctx_legacy(seed_inputs)
+    contexts = [gen_ctx([int(c) for c in combo]) for combo in combos]
+    return _bitmaps(combos, filters, contexts, lambda code, ctx: eval(code, ctx, ctx))
+
+
+def run_sandboxed(combos, filters, seed_inputs):
+    gen_ctx = make_gen_ctx_v3(seed_inputs)
+    contexts = [gen_ctx([int(c) for c in combo]) for combo in combos]
+    sandbox = {"__builtins__": ALLOWED_BUILTINS}
+    return _bitmaps(combos, filters, contexts, lambda code, ctx: eval(code, sandbox, ctx))
+
+
+def run_optimized(combos, filters, seed_inputs):
+    gen_ctx = make_gen_ctx(seed_inputs)
+    contexts = [gen_ctx([int(c) for c in combo]) for combo in combos]
+    hits, errors = [], []
+    for flt in filters:
+        bits, errs = filter_hits(flt, contexts)
+        hits.append(bits)
+        errors.append(errs)
+    return hits, errors
+
+
+def run_sharded(combos, filters, seed_inputs):
+    hits, errors, _offenders = evaluate_sharded(combos, filters, seed_inputs)
+    return hits, errors
+
+
+ENGINES = {
+    'legacy': run_legacy,
+    'sandboxed': run_sandboxed,
+    'optimized': run_optimized,
+    'sharded': run_sharded,
+}
+
+
+# ---------- Comparison ----------
+
+def compare(reference: str, results: dict, combos, filters, samples: int = 3) -> list:
+    """Per-filter mismatches of every engine against ``reference``.
+
+    ``results`` maps an engine name to its ``(hits, errors)``.  Returns one
+    dict per (engine, filter) whose hit set differs, with hit counts, the
+    number of combos only one side eliminates, and a few sample combos.
+    """
+    ref_hits, ref_errors = results[reference]
+    rows = []
+    for engine, (hits, errors) in results.items():
+        if engine == reference:
+            continue
+        for idx, flt in enumerate(filters):
+            diff = ref_hits[idx] ^ hits[idx]
+            if not diff:
+                continue
+            only_ref = ref_hits[idx] & diff
+            only_engine = hits[idx] & diff
+            sample = [combos[i] for _, i in zip(range(samples), iter_bits(diff))]
+            rows.append({
+                'engine': engine,
+                'filter_idx': idx,
+                'id': flt['id'],
+                'name': flt['name'],
+                f'{reference}_hits': ref_hits[idx].bit_count(),
+                'engine_hits': hits[idx].bit_count(),
+                f'only_{reference}': only_ref.bit_count(),
+                'only_engine': only_engine.bit_count(),
+                f'{reference}_errors': ref_errors[idx].bit_count(),
+                'engine_errors': errors[idx].bit_count(),
+                'sample_combos': ' '.join(sample),
+            })
+    return rows
+
+
+def run_harness(seeds, filter_files, engines, method: str = '1-digit', bucket: str = '',
+                reference: str = 'legacy', samples: int = 3, seed_extra: dict = None,
+                bucket_b: str = ''):
+    """Evaluate every engine on every (filter file, seed); returns ``(mismatches, timings)``.
+
+    ``timings`` rows hold ``seconds`` and ``evals_per_s`` (combos x filters
+    per second) per engine and run.
+    """
+    mismatches, timings = [], []
+    for path in filter_files:
+        filters, _repair_log = compile_filter_file(path)
+        for seed in seeds:
+            seed_inputs = {
+                'seed': seed, 'prev_digits': [], 'prev_prev_digits': [], 'prev_prev_prev_digits': [],
+                'hot_digits': [], 'cold_digits': [], 'due_digits': None,
+            }
+            seed_inputs.update(seed_extra or {})
+            combos = generate_combinations(seed, method, bucket, len(seed), bucket_b)
+            results = {}
+            for engine in engines:
+                start = time.perf_counter()
+                results[engine] = ENGINES[engine](combos, filters, seed_inputs)
+                seconds = time.perf_counter() - start
+                timings.append({
+                    'filter_file': path, 'seed': seed, 'engine': engine,
+                    'combos': len(combos), 'filters': len(filters),
+                    'seconds': round(seconds, 3),
+                    'evals_per_s': round(len(combos) * len(filters) / seconds) if seconds else None,
+                })
+            for row in compare(reference, results, combos, filters, samples):
+                mismatches.append(dict(row, filter_file=path, seed=seed))
+    return mismatches, timings
+
+
+def _digits(text: str):
+    return [int(d) for d in text or '' if d.isdigit()]
+
+
+def _print_table(rows, columns):
+    widths = [max(len(str(c)), *(len(str(r.get(c, ''))) for r in rows)) for c in columns]
+    print('  '.join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for r in rows:
+        print('  '.join(str(r.get(c, '')).ljust(w) for c, w in zip(columns, widths)))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seeds', nargs='+', required=True, help="draw 1-back, one or more")
+    parser.add_argument('--filters', nargs='+', default=['lottery_filters_batch10.csv'], help="filter CSVs")
+    parser.add_argument('--engines', nargs='+', default=['legacy', 'sandboxed', 'optimized'],
+                        choices=sorted(ENGINES))
+    parser.add_argument('--reference', default='legacy', choices=sorted(ENGINES))
+    parser.add_argument('--require-identical', nargs='*', default=['optimized'],
+                        help="engines that must match the reference (exit 1 otherwise)")
+    parser.add_argument('--method', default='1-digit')
+    parser.add_argument('--bucket', default='', help="bucket (A) digits for the bucket methods")
+    parser.add_argument('--bucket-b', default='', help="bucket B digits for 'Bucket A1 + B2 + AllBoxPairs'")
+    parser.add_argument('--prev', default='', help="draw 2-back")
+    parser.add_argument('--prev-prev', default='', help="draw 3-back")
+    parser.add_argument('--hot', default='')
+    parser.add_argument('--cold', default='')
+    parser.add_argument('--due', default=None)
+    parser.add_argument('--samples', type=int, default=3, help="sample combos per mismatch")
+    parser.add_argument('--csv', help="write per-filter mismatches to this CSV")
+    args = parser.parse_args(argv)
+
+    engines = list(dict.fromkeys([args.reference] + args.engines))
+    seed_extra = {
+        'prev_digits': _digits(args.prev), 'prev_prev_digits': _digits(args.prev_prev),
+        'hot_digits': _digits(args.hot), 'cold_digits': _digits(args.cold),
+        'due_digits': _digits(args.due) if args.due else None,
+    }
+    mismatches, timings = run_harness(args.seeds, args.filters, engines, args.method, args.bucket,
+                                      args.reference, args.samples, seed_extra, args.bucket_b)
+
+    print("Throughput")
+    _print_table(timings, ['filter_file', 'seed', 'engine', 'combos', 'filters', 'seconds', 'evals_per_s'])
+    print()
+    by_engine = Counter(m['engine'] for m in mismatches)
+    print(f"Mismatching filters vs {args.reference}: "
+          + (", ".join(f"{e}: {by_engine[e]}" for e in engines if e != args.reference) or "none"))
+    if mismatches:
+        _print_table(mismatches, ['engine', 'seed', 'id', f'{args.reference}_hits', 'engine_hits',
+                                  f'only_{args.reference}', 'only_engine', 'engine_errors', 'sample_combos'])
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            columns = ['filter_file', 'seed'] + [c for c in (mismatches[0] if mismatches else {})
+                                                   if c not in ('filter_file', 'seed')]
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(mismatches)
+    return 1 if any(by_engine[e] for e in args.require_identical) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# filter_analysis.py
+"""Marginal-value analysis over per-filter hit bitmaps (no Streamlit imports).
+
+Everything here is popcounts on the bitmaps produced by ``filter_engine``;
+the pool is never re-evaluated.
+"""
+
+
+def marginal_values(hits, active, pool_size: int, top_k: int = 3) -> list:
+    """Per enabled filter: unique kills, survivors if turned off, most similar filters.
+
+    ``hits``/``active`` are aligned with the filter list (pending bitmaps
+    are ``None`` and skipped).  Returns one dict per enabled filter with
+    keys ``idx``, ``hits``, ``unique``, ``survivors_if_off`` and
+    ``similar`` -- a list of ``(other_idx, overlap, jaccard)`` for the
+    ``top_k`` enabled filters sharing the most combos with it.
+    """
+    enabled = [i for i, (bits, on) in enumerate(zip(hits, active)) if on and bits is not None]
+
+    # once: hit by at least one enabled filter; multi: by two or more
+    once = multi = 0
+    for i in enabled:
+        multi |= once & hits[i]
+        once |= hits[i]
+    survivors = pool_size - once.bit_count()
+
+    # identical bitmaps are common (same rule, different seeds); compare each once
+    groups = {}
+    for i in enabled:
+        if hits[i]:
+            groups.setdefault(hits[i], []).append(i)
+    bitmaps = list(groups)
+    sizes = [b.bit_count() for b in bitmaps]
+
+    similar = {}
+    for a, (bits_a, size_a) in enumerate(zip(bitmaps, sizes)):
+        scored = []
+        for b, (bits_b, size_b) in enumerate(zip(bitmaps, sizes)):
+            if a == b:
+                continue
+            overlap = (bits_a & bits_b).bit_count()
+            if overlap:
+                scored.append((overlap / (size_a + size_b - overlap), overlap, b))
+        scored.sort(reverse=True)
+        similar[bits_a] = scored[:top_k]
+
+    rows = []
+    for i in enabled:
+        bits = hits[i]
+        unique = (bits & ~multi).bit_count()
+        sim = []
+        if bits:
+            # a twin with the same bitmap is the most similar filter of all
+            twins = [j for j in groups[bits] if j != i]
+            sim = [(j, bits.bit_count(), 1.0) for j in twins[:top_k]]
+            for jac, overlap, b in similar[bits]:
+                if len(sim) >= top_k:
+                    break
+                sim.append((groups[bitmaps[b]][0], overlap, jac))
+        rows.append({
+            'idx': i,
+            'hits': bits.bit_count(),
+            'unique': unique,
+            'survivors_if_off': survivors + unique,
+            'similar': sim,
+        })
+    return rows
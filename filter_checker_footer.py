@@ -5,12 +5,16 @@ import io
 import ast
 import pandas as pd
 
+from filter_loader import repair_source
+
 REQUIRED_COLS = ["id", "name", "enabled", "applicable_if", "expression"]
+CODE_COLS = ("applicable_if", "expression")
 
-def _compile_ok(expr: str) -> (bool, str):
-    expr = (expr or "").strip().strip('"').strip("'")
+def _compile_ok(expr: str, default: str) -> (bool, str):
+    # same load-time repairs the app applies, so this reports what will actually run
+    expr, _fixes = repair_source(expr, default)
     try:
-        ast.parse(f"({expr})", mode="eval")
+        ast.parse(expr, mode="eval")
         return True, ""
     except SyntaxError as e:
         return False, f"SyntaxError: {e}"
@@ -20,7 +24,8 @@ def _normalize_cols(row: dict) -> dict:
     r = { (k or "").lower(): (v if isinstance(v, str) else v) for k, v in row.items() }
     for k in list(r.keys()):
         if isinstance(r[k], str):
-            r[k] = r[k].strip().strip('"').strip("'")
+            # code cells keep their quotes; repair_source unwraps them safely
+            r[k] = r[k].strip() if k in CODE_COLS else r[k].strip().strip('"').strip("'")
     # Ensure all required keys exist
     for c in REQUIRED_COLS:
         r.setdefault(c, "")
@@ -57,8 +62,8 @@ def render_filter_checker(*, combos=None, filters_df=None):
         # Compile-check only (no execution)
         ok_flags, errs = [], []
         for _, r in df.iterrows():
-            ok_app, err_app = _compile_ok(r["applicable_if"])
-            ok_expr, err_expr = _compile_ok(r["expression"])
+            ok_app, err_app = _compile_ok(r["applicable_if"], "True")
+            ok_expr, err_expr = _compile_ok(r["expression"], "False")
             ok_flags.append(ok_app and ok_expr)
             errs.append(err_app or err_expr)
 
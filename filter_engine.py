@@ -0,0 +1,635 @@
+# filter_engine.py
+"""Pool evaluation for the DC-5 filter tester (no Streamlit imports here).
+
+Every filter is evaluated once per combo and the result is kept as a hit
+bitmap: a Python int whose bit ``i`` is set when the filter eliminates
+``combos[i]``.  The sidebar totals, the initial counts and the dynamic
+counts are all derived from those bitmaps, so toggling a filter never
+needs another evaluation pass.
+"""
+import builtins
+from array import array
+import os
+import signal
+import threading
+import time
+from collections import Counter
+import multiprocessing as mp
+
+
+# V-Trac and mirror mappings
+V_TRAC_GROUPS = {0:1,5:1,1:2,6:2,2:3,7:3,3:4,8:4,4:5,9:5}
+MIRROR_PAIRS = {0:5,5:0,1:6,6:1,2:7,7:2,3:8,8:3,4:9,9:4}
+MIRROR = MIRROR_PAIRS
+
+_BUILTINS = vars(builtins)
+
+TRACE_MAX_FILTERS = 2 ** 15 - 1
+
+
+def sum_category(total: int, n: int = 5) -> str:
+    # DC-5 cut-offs 15/24/33, scaled to the combo length for other Pick-N games
+    very_low, low, mid = (15 * n // 5, 24 * n // 5, 33 * n // 5)
+    if 0 <= total <= very_low:
+        return 'Very Low'
+    elif very_low < total <= low:
+        return 'Low'
+    elif low < total <= mid:
+        return 'Mid'
+    else:
+        return 'High'
+
+
+_REPEAT_NAMES = {2: 'DOUBLE', 3: 'TRIPLE', 4: 'QUAD', 5: 'QUINT'}
+
+
+def structure_of(digits):
+    """SINGLE, DOUBLE, DOUBLE-DOUBLE, TRIPLE, TRIPLE-DOUBLE, QUAD, QUINT for any length.
+
+    Named after the repeated digits, largest group first; groups bigger
+    than five (long Pick-N combos) fall back to ``OTHER-[counts]``.
+    """
+    counts = sorted(Counter(digits).values(), reverse=True)
+    repeats = [c for c in counts if c > 1]
+    if not repeats:
+        return 'SINGLE'
+    if repeats[0] > 5:
+        return f'OTHER-{counts}'
+    return '-'.join(_REPEAT_NAMES[c] for c in repeats)
+
+
+# Per-combo layer: the only keys that depend on the combo itself.
+COMBO_FEATURES = {
+    "combo_sum": lambda ctx: sum(ctx["combo_digits"]),
+    "combo_sum_cat": lambda ctx: sum_category(ctx["combo_sum"], len(ctx["combo_digits"])),
+    "combo_vtracs": lambda ctx: set(V_TRAC_GROUPS[d] for d in ctx["combo_digits"]),
+    "combo_structure": lambda ctx: structure_of(ctx["combo_digits"]),
+}
+
+
+class ComboContext(dict):
+    """Per-combo ``gen_ctx`` layer sitting on top of the run's seed layer.
+
+    Only ``combo_digits`` is stored up front.  A missing key is computed
+    from ``COMBO_FEATURES``, or else taken from the shared seed layer (then
+    builtins), and memoized so each name is resolved at most once per combo.
+    Filters are evaluated with the context as both globals and locals, and
+    ``eval`` looks names up through ``__missing__`` in both cases (including
+    inside generator expressions), so filters see the same names as before.
+    """
+    __slots__ = ('_seed',)
+
+    def __init__(self, cdigits, seed_layer):
+        super().__init__(combo_digits=cdigits)
+        self._seed = seed_layer
+
+    def __missing__(self, key):
+        compute = COMBO_FEATURES.get(key)
+        if compute is not None:
+            value = compute(self)
+        elif key in self._seed:
+            value = self._seed[key]
+        else:
+            value = _BUILTINS[key]  # unknown names still raise KeyError
+        self[key] = value
+        return value
+
+
+def make_seed_layer(seed_inputs: dict) -> dict:
+    """Everything in ``gen_ctx`` that is constant for the run, built once.
+
+    ``seed_inputs`` holds only strings and digit lists so it can be pickled
+    into worker processes, which rebuild the same layer on their side.
+    ``due_digits`` of ``None`` means "derive from the two previous draws".
+    """
+    seed = seed_inputs['seed']
+    seed_digits = [int(d) for d in seed]
+    prev_digits = seed_inputs['prev_digits']
+    prev_prev_digits = seed_inputs['prev_prev_digits']
+    prev_prev_prev_digits = seed_inputs['prev_prev_prev_digits']
+    due_digits = seed_inputs['due_digits']
+    if due_digits is None:
+        due_digits = [d for d in range(10) if d not in prev_digits and d not in prev_prev_digits]
+
+    prev_pattern = []
+    for digs in (prev_prev_digits, prev_digits, seed_digits):
+        parity = 'Even' if sum(digs) % 2 == 0 else 'Odd'
+        prev_pattern.extend([sum_category(sum(digs), len(seed_digits)), parity])
+
+    return {
+        "seed_value": int(seed),
+        "seed_sum": sum(seed_digits),
+        "prev_seed_sum": sum(prev_digits) if prev_digits else None,
+        "prev_prev_seed_sum": sum(prev_prev_digits) if prev_prev_digits else None,
+        "prev_prev_prev_seed_sum": sum(prev_prev_prev_digits) if prev_prev_prev_digits else None,
+
+        "seed_digits_1": prev_digits,
+        "seed_digits_2": prev_prev_digits,
+        "seed_digits_3": prev_prev_prev_digits,
+
+        "nan": float("nan"),
+
+        "seed_digits": seed_digits,
+        "prev_seed_digits": prev_digits,
+        "prev_prev_seed_digits": prev_prev_digits,
+        "prev_prev_prev_seed_digits": prev_prev_prev_digits,
+
+        "new_seed_digits": set(seed_digits) - set(prev_digits),
+        "prev_pattern": tuple(prev_pattern),
+
+        "hot_digits": seed_inputs['hot_digits'],
+        "cold_digits": seed_inputs['cold_digits'],
+        "due_digits": due_digits,
+
+        "seed_counts": Counter(seed_digits),
+        "seed_vtracs": set(V_TRAC_GROUPS[d] for d in seed_digits),
+
+        "common_to_both": set(seed_digits) & set(prev_digits),
+        "last2": set(seed_digits) | set(prev_digits),
+
+        "Counter": Counter,
+        "winner_structure": structure_of(seed_digits),
+
+        "MIRROR": MIRROR,
+        "mirror": MIRROR,
+        "MIRROR_PAIRS": MIRROR_PAIRS,
+
+        "V_TRAC_GROUPS": V_TRAC_GROUPS,
+        "VTRAC_GROUPS": V_TRAC_GROUPS,
+        "V_TRAC": V_TRAC_GROUPS,
+        "vtrac": V_TRAC_GROUPS,
+
+        "digit_prev_letters": {},
+        "digit_current_letters": {},
+        "prev_core_letters": set(),
+        "core_letters_prevmap": [],
+
+        "applicable_if": True,
+    }
+
+
+def make_gen_ctx(seed_inputs: dict):
+    """Return ``gen_ctx(cdigits)`` for one run: a shared seed layer plus a per-combo layer."""
+    seed_layer = make_seed_layer(seed_inputs)
+
+    def gen_ctx(cdigits):
+        return ComboContext(cdigits, seed_layer)
+
+    return gen_ctx
+
+
+def iter_bits(bits: int):
+    """Yield the indices of the set bits of ``bits`` in ascending order."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def _flags_to_bits(flags) -> int:
+    # flags[0] is slot 0, i.e. the least significant bit
+    return int(bytes(reversed(flags)) or b'0', 2)
+
+
+def filter_hits(flt, contexts, cancel=None):
+    """Return ``(hits, errors)`` bitmaps of ``flt`` over ``contexts``.
+
+    A context where the filter raises counts as not firing and gets its bit
+    set in ``errors`` instead -- including ``SystemExit`` from ``exit()``,
+    which must not take the worker thread down.  Returns None if ``cancel``
+    gets set.
+    """
+    app_code = flt['applicable_code']
+    expr_code = flt['expr_code']
+    flags = bytearray(b'0' * len(contexts))
+    err_flags = bytearray(b'0' * len(contexts))
+    for i, ctx in enumerate(contexts):
+        if cancel is not None and cancel.is_set():
+            return None
+        try:
+            if eval(app_code, ctx, ctx) and eval(expr_code, ctx, ctx):
+                flags[i] = 0x31  # '1'
+        except FilterTimeout:
+            raise
+        except BaseException:
+            err_flags[i] = 0x31
+    return _flags_to_bits(flags), _flags_to_bits(err_flags)
+
+
+def elimination_trace(pool_size: int, hits, active):
+    """Compact first-match trace: ``array('h')`` of the first eliminating filter per slot.
+
+    Slot ``i`` holds the index (file order) of the first active filter that
+    removes ``combos[i]``, or -1 if the combo survives.  This replays the
+    original first-match pass from bitmaps; pending (``None``) filters are
+    skipped.
+    """
+    if len(hits) > TRACE_MAX_FILTERS:
+        raise ValueError(f"int16 trace holds at most {TRACE_MAX_FILTERS} filters, got {len(hits)}")
+    trace = array('h', [-1]) * pool_size
+    remaining = (1 << pool_size) - 1
+    for idx, (bits, on) in enumerate(zip(hits, active)):
+        if not on or not bits:
+            continue
+        for i in iter_bits(bits & remaining):
+            trace[i] = idx
+        remaining &= ~bits
+    return trace
+
+
+def dynamic_counts(order, hits, active, pool_size: int) -> dict:
+    """Sequential elimination counts for the filters in display ``order``.
+
+    ``order`` is a list of indices into ``hits``/``active``; the result maps
+    each index to how many combos it removed from what was still left.
+    """
+    remaining = (1 << pool_size) - 1
+    counts = {}
+    for idx in order:
+        bits = hits[idx]
+        if not active[idx] or not bits:
+            counts[idx] = 0
+            continue
+        counts[idx] = (bits & remaining).bit_count()
+        remaining &= ~bits
+    return counts
+
+
+def _evaluate_one(flt, ctx):
+    """``(fired, error_message)`` of ``flt`` in one context."""
+    try:
+        return bool(eval(flt['applicable_code'], ctx, ctx) and eval(flt['expr_code'], ctx, ctx)), None
+    except FilterTimeout:
+        raise
+    except BaseException as e:
+        return False, str(e) or type(e).__name__
+
+
+def check_combos(queries, combos, filters, hits, errors, active, gen_ctx, combo_len: int = 5) -> list:
+    """Diagnose many combos at once, answering from the pool bitmaps where possible.
+
+    ``queries`` are raw combo strings; each is box-normalized (digits
+    sorted) before lookup.  Returns one dict per query with ``combo``,
+    ``box``, ``status`` (``'survived'``, ``'eliminated'``, ``'not in pool'``
+    or ``'invalid'``), ``eliminated_by`` (first active filter, file order),
+    ``triggered`` (ids of every filter that fires) and ``errors``
+    (``(id, message)`` for every filter that raises).  Only combos outside
+    the pool, filters whose bitmap is ``None`` (never evaluated, e.g. the
+    job failed) and the error messages need a fresh evaluation.
+    """
+    slot = {combo: i for i, combo in enumerate(combos)}
+    results = []
+    for raw in queries:
+        digits = ''.join(ch for ch in raw if ch.isdigit())
+        box = ''.join(sorted(digits))
+        entry = {'combo': raw, 'box': box, 'status': 'invalid', 'eliminated_by': '',
+                 'triggered': [], 'errors': []}
+        results.append(entry)
+        if len(box) != combo_len:
+            continue
+        ctx = gen_ctx([int(c) for c in box])
+        i = slot.get(box)
+        if i is None:
+            entry['status'] = 'not in pool'
+            for flt in filters:
+                fired, error = _evaluate_one(flt, ctx)
+                if fired:
+                    entry['triggered'].append(flt['id'])
+                elif error is not None:
+                    entry['errors'].append((flt['id'], error))
+            continue
+        bit = 1 << i
+        entry['status'] = 'survived'
+        for flt, bits, errs, on in zip(filters, hits, errors, active):
+            if bits is None:
+                fired, error = _evaluate_one(flt, ctx)
+            else:
+                fired = bool(bits & bit)
+                error = _evaluate_one(flt, ctx)[1] if not fired and errs & bit else None
+            if fired:
+                entry['triggered'].append(flt['id'])
+                if on and entry['status'] == 'survived':
+                    entry['status'] = 'eliminated'
+                    entry['eliminated_by'] = flt['name']
+            elif error is not None:
+                entry['errors'].append((flt['id'], error))
+    return results
+
+
+class EvaluationJob(threading.Thread):
+    """Evaluate every filter over a pool in a background thread.
+
+    The Streamlit script polls ``snapshot()`` on each rerun and calls
+    ``cancel()`` as soon as its inputs no longer match ``key``.  ``known``
+    (aligned with ``filters``) carries ``(hits, errors)`` already computed
+    for this pool, e.g. for filters unchanged since the file was last
+    edited; only the ``None`` entries are evaluated.
+    """
+
+    def __init__(self, key, combos, filters, gen_ctx, known=None):
+        super().__init__(daemon=True)
+        self.key = key
+        self.combos = combos
+        self.filters = filters
+        self.gen_ctx = gen_ctx
+        self.hits = [None] * len(filters)
+        self.errors = [None] * len(filters)
+        for idx, result in enumerate(known or ()):
+            if result is not None:
+                self.hits[idx], self.errors[idx] = result
+        self.todo = [idx for idx, bits in enumerate(self.hits) if bits is None]
+        self.done = len(filters) - len(self.todo)
+        self.error = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self):
+        try:
+            if not self.todo:
+                return
+            contexts = []
+            for combo in self.combos:
+                if self._cancel.is_set():
+                    return
+                contexts.append(self.gen_ctx([int(c) for c in combo]))
+            for idx in self.todo:
+                result = filter_hits(self.filters[idx], contexts, self._cancel)
+                if result is None:
+                    return
+                with self._lock:
+                    self.hits[idx], self.errors[idx] = result
+                    self.done += 1
+        except BaseException as e:  # surfaced by the UI instead of dying silently
+            self.error = e
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.done == len(self.filters) or self.error is not None
+
+    def snapshot(self):
+        """Return ``(done, hits, errors)`` with copies of the bitmaps finished so far."""
+        with self._lock:
+            return self.done, list(self.hits), list(self.errors)
+
+
+# ---------- Chunked evaluation for pools too large to hold ----------
+
+def iter_survivors(chunks, filters, active, gen_ctx, cancel=None):
+    """Filter a lazily generated pool chunk by chunk.
+
+    Yields ``(n_in_chunk, survivors, first_counts)`` per chunk using the
+    original first-match pass (a combo stops at the first active filter
+    that fires); ``first_counts`` maps a filter index to how many combos of
+    the chunk it removed first.  Nothing beyond one chunk is ever held.
+    """
+    live = [(idx, flt['applicable_code'], flt['expr_code'])
+            for idx, (flt, on) in enumerate(zip(filters, active)) if on]
+    for chunk in chunks:
+        if cancel is not None and cancel.is_set():
+            return
+        kept = []
+        first_counts = Counter()
+        for combo in chunk:
+            ctx = gen_ctx([int(c) for c in combo])
+            for idx, app_code, expr_code in live:
+                try:
+                    if eval(app_code, ctx, ctx) and eval(expr_code, ctx, ctx):
+                        first_counts[idx] += 1
+                        break
+                except BaseException:  # incl. SystemExit from exit(), like filter_hits
+                    continue
+            else:
+                kept.append(combo)
+        yield len(chunk), kept, first_counts
+
+
+class ChunkedEvaluationJob(threading.Thread):
+    """Stream one or more pools through ``iter_survivors`` in a background thread.
+
+    ``runs`` is a list of ``(label, chunks, gen_ctx)`` -- one per seed.
+    Memory stays O(chunk): only running totals, per-filter first-elimination
+    counts and a bounded survivor sample are kept.  With ``out_path`` every
+    survivor is appended to ``<out_path>.partial`` as soon as its chunk is
+    done; the file is renamed to ``out_path`` (and ``saved`` set) only when
+    the run finishes uncancelled and without error, and deleted otherwise.
+    ``out_path`` must be unique per job: the partial file is opened with 'x'.
+    """
+
+    def __init__(self, key, runs, filters, active, sample_size: int = 1000, out_path: str = None):
+        super().__init__(daemon=True)
+        self.key = key
+        self.runs = runs
+        self.filters = filters
+        self.active = active
+        self.sample_size = sample_size
+        self.out_path = out_path
+        self.seen = 0
+        self.survivors = 0
+        self.sample = []
+        self.first_counts = Counter()
+        self.finished = False
+        self.saved = False
+        self.error = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self):
+        out = None
+        partial = self.out_path + '.partial' if self.out_path else None
+        try:
+            if partial:
+                os.makedirs(os.path.dirname(partial) or '.', exist_ok=True)
+                out = open(partial, 'x', newline='', encoding='utf-8')
+                out.write("seed,combo\n")
+            for label, chunks, gen_ctx in self.runs:
+                for n, kept, first_counts in iter_survivors(chunks, self.filters, self.active,
+                                                            gen_ctx, self._cancel):
+                    if out is not None:
+                        out.writelines(f"{label},{combo}\n" for combo in kept)
+                        out.flush()
+                    with self._lock:
+                        self.seen += n
+                        self.survivors += len(kept)
+                        self.first_counts.update(first_counts)
+                        self.sample.extend(kept[:self.sample_size - len(self.sample)])
+            if out is not None:
+                out.close()
+                out = None
+                if not self._cancel.is_set():
+                    os.replace(partial, self.out_path)
+                    self.saved = True
+            self.finished = not self._cancel.is_set()
+        except BaseException as e:
+            self.error = e
+            self.finished = True
+        finally:
+            if out is not None:
+                out.close()
+            if partial and not self.saved:
+                try:
+                    os.remove(partial)
+                except OSError:
+                    pass
+
+    def cancel(self):
+        self._cancel.set()
+
+    def snapshot(self):
+        """Return ``(seen, survivors, sample, first_counts)`` so far."""
+        with self._lock:
+            return self.seen, self.survivors, list(self.sample), Counter(self.first_counts)
+
+
+# ---------- Process-pool sharded evaluation ----------
+# Each worker process builds the pool contexts once (pool initializer) and
+# then evaluates one filter per task.  A filter gets ``budget`` seconds over
+# the whole pool: SIGALRM interrupts Python-level loops inside the worker,
+# and the parent kills the pool when a task is stuck in C code (e.g.
+# ``sum(range(10**12))``) or its worker died, and no result arrives within
+# the grace period.
+
+class FilterTimeout(BaseException):
+    """Raised by SIGALRM; a BaseException so ``filter_hits`` cannot swallow it."""
+
+
+_worker = {}
+
+
+def _on_alarm(signum, frame):
+    raise FilterTimeout()
+
+
+def _init_worker(seed_inputs, combos, started_at):
+    gen_ctx = make_gen_ctx(seed_inputs)
+    _worker['contexts'] = [gen_ctx([int(c) for c in combo]) for combo in combos]
+    _worker['started_at'] = started_at
+    if hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGALRM, _on_alarm)
+
+
+def _run_one(idx, app_src, expr_src, budget):
+    """Evaluate filter ``idx`` in a worker; returns ``(idx, bits, errors, status)``."""
+    _worker['started_at'][idx] = time.time()
+    flt = {
+        'applicable_code': compile(app_src, '<applicable>', 'eval'),
+        'expr_code': compile(expr_src, '<expr>', 'eval'),
+    }
+    use_alarm = hasattr(signal, 'setitimer')
+    try:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, budget)
+        bits, errors = filter_hits(flt, _worker['contexts'])
+        status = 'ok'
+    except FilterTimeout:
+        bits, errors, status = 0, 0, 'timeout'
+    except BaseException:  # anything filter_hits let through must not end the worker
+        bits, errors, status = 0, 0, 'crashed'
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return idx, bits, errors, status
+
+
+def evaluate_sharded(combos, filters, seed_inputs, budget: float = 2.0,
+                     workers: int = None, grace: float = 2.0,
+                     on_result=None, cancel=None, only=None):
+    """Evaluate ``filters`` over ``combos`` across a process pool.
+
+    Returns ``(hits, errors, offenders)``: ``hits``/``errors`` are aligned
+    with ``filters`` like the single-threaded path, and ``offenders`` maps
+    a filter index to ``'timeout'`` (interrupted), ``'crashed'`` (raised out
+    of the evaluation loop) or ``'killed'`` (no result within budget + grace,
+    whether stuck or its worker died).  All count as not firing, like a
+    filter that raises.
+    ``on_result(idx, bits, errors, status)`` is called as each filter finishes,
+    ``status`` being ``'ok'`` or the offender kind.
+    ``only`` restricts the run to those filter indices (the rest stay ``None``).
+    """
+    workers = workers or os.cpu_count() or 1
+    ctx = mp.get_context('spawn')  # never fork the threaded Streamlit process
+    hits = [None] * len(filters)
+    errors = [None] * len(filters)
+    offenders = {}
+    pending = set(range(len(filters)) if only is None else only)
+
+    while pending:
+        if cancel is not None and cancel.is_set():
+            return None, None, offenders
+        n_workers = min(workers, len(pending))
+        started_at = ctx.Array('d', [0.0] * len(filters))  # per filter; 0 = not picked up yet
+        pool = ctx.Pool(n_workers, initializer=_init_worker,
+                        initargs=(seed_inputs, combos, started_at))
+        killed = None
+        try:
+            results = {
+                idx: pool.apply_async(_run_one, (idx, filters[idx]['applicable_src'],
+                                                 filters[idx]['expr_src'], budget))
+                for idx in sorted(pending)
+            }
+            while results and killed is None:
+                if cancel is not None and cancel.is_set():
+                    return None, None, offenders
+                for idx in [i for i, r in results.items() if r.ready()]:
+                    _, bits, errs, status = results.pop(idx).get()
+                    pending.discard(idx)
+                    hits[idx], errors[idx] = bits, errs
+                    if status != 'ok':
+                        offenders[idx] = status
+                    if on_result is not None:
+                        on_result(idx, bits, errs, status)
+                # a task still unanswered long after it started is stuck, or its worker died
+                now = time.time()
+                for idx in results:
+                    since = started_at[idx]
+                    if since and now - since > budget + grace:
+                        killed = idx
+                        break
+                else:
+                    time.sleep(0.02)
+        finally:
+            pool.terminate()
+            pool.join()
+        if killed is not None:
+            # the stuck filter is reported; everything else unfinished reruns on a fresh pool
+            pending.discard(killed)
+            hits[killed] = errors[killed] = 0
+            offenders[killed] = 'killed'
+            if on_result is not None:
+                on_result(killed, 0, 0, 'killed')
+    return hits, errors, offenders
+
+
+class ShardedEvaluationJob(EvaluationJob):
+    """``EvaluationJob`` that drives ``evaluate_sharded`` instead of a local loop."""
+
+    def __init__(self, key, combos, filters, seed_inputs, budget: float = 2.0, known=None):
+        super().__init__(key, combos, filters, make_gen_ctx(seed_inputs), known)
+        self.seed_inputs = seed_inputs
+        self.budget = budget
+        self.offenders = {}
+
+    def _record(self, idx, bits, errors, status):
+        with self._lock:
+            if status != 'ok':
+                # published before ``done`` counts the filter, so ``finished``
+                # never shows a timed-out filter's zeros without its status
+                self.offenders = {**self.offenders, idx: status}
+            self.hits[idx] = bits
+            self.errors[idx] = errors
+            self.done += 1
+
+    def run(self):
+        try:
+            if not self.todo:
+                return
+            evaluate_sharded(self.combos, self.filters, self.seed_inputs, budget=self.budget,
+                             on_result=self._record, cancel=self._cancel, only=self.todo)
+        except BaseException as e:  # like EvaluationJob.run: never leave the UI polling
+            self.error = e
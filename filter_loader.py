@@ -0,0 +1,241 @@
+# filter_loader.py
+"""Load-time repair and compile pipeline for filter CSVs (no Streamlit imports).
+
+Every known fix for hand-edited filter files is applied once, here, and
+each filter leaves with compiled code objects.  Nothing downstream ever
+evals a string or retries a SyntaxError.  Each fix is recorded in a
+repair log so the UI can show what was changed and which rows were
+rejected.  ``CompiledFilterFile`` keeps a file compiled across edits and
+recompiles only rows whose content hash changed.
+"""
+import ast
+import csv
+import hashlib
+import os
+import re
+import threading
+
+# --- literal sanitizer for legacy 08/09 style ints ---
+_leading_zero_int = re.compile(r'(?<![\w])0+(\d+)(?!\s*\.)')  # 08 -> 8, leaves 0.5 alone
+
+# Values some rows carry instead of a real applicable_if expression
+_PLACEHOLDER_APPLICABLE = {'', 'applicable_if', 'none'}
+
+
+def _parses(src: str) -> bool:
+    try:
+        ast.parse(src, mode='eval')
+        return True
+    except SyntaxError:
+        return False
+
+
+def _unwrap_string_literal(src: str):
+    """``'"combo_sum == 1"'`` -> ``'combo_sum == 1'``; None if src is not a quoted string."""
+    try:
+        node = ast.parse(src, mode='eval').body
+    except SyntaxError:
+        return None
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value.strip()
+    return None
+
+
+def _strip_stray_quotes(src: str) -> str:
+    """Legacy ``.strip('"').strip("'")``, kept only when it yields valid code."""
+    stripped = src.strip('"').strip("'").strip()
+    return stripped if _parses(stripped) else src
+
+
+def _close_unterminated_quote(src: str) -> str:
+    """``combo_sum_cat != 'Low`` -> ``combo_sum_cat != 'Low'`` (truncated cells)."""
+    for q in ("'", '"'):
+        if src.count(q) % 2:
+            return src + q
+    return src
+
+
+# Tried in order, cumulatively, only while the source still fails to parse.
+_REPAIRS = [
+    ("'!==' -> '!='", lambda s: s.replace('!==', '!=')),
+    ("leading-zero int literals", lambda s: _leading_zero_int.sub(r"\1", s)),
+    ("stripped stray outer quotes", _strip_stray_quotes),
+    ("closed unterminated string", _close_unterminated_quote),
+]
+
+
+def repair_source(src: str, default: str):
+    """Return ``(source, fixes)`` for one applicable_if/expression cell.
+
+    ``source`` may still fail to compile; ``fixes`` lists what was changed.
+    """
+    fixes = []
+    src = (src or '').strip()
+    # CSV exports wrap whole expressions in quotes ("""True""" -> "True" -> True)
+    while True:
+        inner = _unwrap_string_literal(src)
+        if inner is None:
+            break
+        src = inner
+        fixes.append("unwrapped quoted expression")
+    if default == 'True' and src.lower() in _PLACEHOLDER_APPLICABLE:
+        if src:
+            fixes.append(f"placeholder {src!r} -> True")
+        return 'True', fixes
+    if not src:
+        return default, fixes
+    for label, fix in _REPAIRS:
+        if _parses(src):
+            break
+        fixed = fix(src)
+        if fixed != src:
+            src = fixed
+            fixes.append(label)
+    return src, fixes
+
+
+def row_hash(raw: dict) -> str:
+    """Content hash of one raw CSV row (column order and values)."""
+    text = '\x1f'.join(f"{k}\x1e{v}" for k, v in raw.items())
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _compile_row(raw: dict):
+    """Repair and compile one raw row; returns ``(filter_or_None, entries)``.
+
+    ``entries`` are repair-log dicts without the ``row`` number, so they can
+    be reused when the same row moves within the file.  ``filter`` is None
+    for repeated header rows and rejected rows.
+    """
+    entries = []
+
+    def log(fid, field, action, detail=''):
+        entries.append({'id': fid, 'field': field, 'action': action, 'detail': detail})
+
+    row = {}
+    stray = []
+    for k, v in raw.items():
+        key = (k or '').strip().lower()
+        if not key or key.startswith('unnamed'):
+            if v and str(v).strip():
+                stray.append(key or '<extra>')
+            continue
+        row[key] = v
+    fid = (row.get('id') or row.get('fid') or '').strip()
+    if fid.lower() in {'id', 'fid'}:
+        log(fid, '', 'skipped', 'repeated header row')
+        return None, entries
+    if stray:
+        log(fid, ', '.join(stray), 'dropped stray columns')
+    row['id'] = fid
+    row['name'] = (row.get('name') or '').strip().strip('"').strip("'")
+
+    codes = {}
+    for field, out, default in (('applicable_if', 'applicable', 'True'),
+                                ('expression', 'expr', 'False')):
+        src, fixes = repair_source(row.get(field), default)
+        for fix in fixes:
+            log(fid, field, fix)
+        try:
+            codes[out] = (src, compile(src, f'<{out}>', 'eval'))
+        except (SyntaxError, ValueError) as e:
+            log(fid, field, 'rejected', f"{getattr(e, 'msg', e)}: {src}")
+            return None, entries
+    row['applicable_src'], row['applicable_code'] = codes['applicable']
+    row['expr_src'], row['expr_code'] = codes['expr']
+    return row, entries
+
+
+def compile_filter_rows(rows, compiled=None) -> tuple:
+    """Repair and compile CSV rows; returns ``(filters, repair_log)``.
+
+    Each filter is the row with lower-cased keys, stray columns dropped, and
+    ``applicable_src``/``expr_src`` plus ``applicable_code``/``expr_code``
+    added, and ``hash`` set to the raw row's content hash.  Rows that still
+    do not compile are left out and logged with action ``'rejected'``.
+
+    ``compiled`` maps ``(id, hash)`` to an earlier ``_compile_row`` result;
+    rows found there are reused instead of recompiled, and rows compiled now
+    are added to it.
+    """
+    filters = []
+    repair_log = []
+    if compiled is None:
+        compiled = {}
+    for row_no, raw in enumerate(rows, start=2):  # row 1 is the header
+        h = row_hash(raw)
+        key = ((raw.get('id') or raw.get('fid') or '').strip(), h)
+        if key not in compiled:
+            compiled[key] = _compile_row(raw)
+        flt, entries = compiled[key]
+        repair_log.extend(dict(e, row=row_no) for e in entries)
+        if flt is not None:
+            flt['hash'] = h
+            filters.append(flt)
+    return filters, repair_log
+
+
+def compile_filter_file(path: str) -> tuple:
+    """Read ``path`` and run it through ``compile_filter_rows``."""
+    with open(path, newline='', encoding='utf-8') as f:
+        return compile_filter_rows(csv.DictReader(f))
+
+
+class CompiledFilterFile:
+    """A filter CSV kept compiled across edits.
+
+    ``refresh()`` re-reads the file only when its mtime or size changed, and
+    then recompiles only rows whose ``(id, content hash)`` is new.  The
+    unchanged filters are the very same dicts as before, so anything keyed
+    by a filter's ``hash`` stays valid.  ``prepare(filter)`` runs once on
+    each newly compiled filter before it is published.  Safe to share
+    between threads: filters are never mutated after publication.
+    """
+
+    def __init__(self, path: str, prepare=None):
+        self.path = path
+        self.prepare = prepare
+        self.filters = []
+        self.repair_log = []
+        self.changes = {'added': [], 'modified': [], 'removed': []}
+        self._stamp = None
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """Reload if the file changed on disk; returns True when it did."""
+        info = os.stat(self.path)
+        stamp = (info.st_mtime_ns, info.st_size)
+        with self._lock:
+            if stamp == self._stamp:
+                return False
+            with open(self.path, newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+            old = {flt['id']: flt['hash'] for flt in self.filters}
+            compiled = {}
+            for raw in rows:  # keep only entries still present, so the cache tracks the file
+                key = ((raw.get('id') or raw.get('fid') or '').strip(), row_hash(raw))
+                if key in self._compiled:
+                    compiled[key] = self._compiled[key]
+            reused = set(compiled)
+            filters, repair_log = compile_filter_rows(rows, compiled)
+            if self.prepare is not None:
+                for key, (flt, _) in compiled.items():
+                    if key not in reused and flt is not None:
+                        self.prepare(flt)
+            self._compiled = compiled
+            new = {flt['id']: flt['hash'] for flt in filters}
+            if self._stamp is not None:
+                self.changes = {
+                    'added': [fid for fid in new if fid not in old],
+                    'modified': [fid for fid in new if fid in old and new[fid] != old[fid]],
+                    'removed': [fid for fid in old if fid not in new],
+                }
+            self.filters, self.repair_log = filters, repair_log
+            self._stamp = stamp
+            return True
+
+    def snapshot(self) -> tuple:
+        """``(filters, repair_log, changes)`` from one consistent reload."""
+        with self._lock:
+            return self.filters, self.repair_log, self.changes
@@ -1,144 +1,216 @@
 import streamlit as st
-from itertools import product, combinations, combinations_with_replacement
-import csv
 import os
 from collections import Counter
 import math
-
-# V-Trac and mirror mappings
-V_TRAC_GROUPS = {0:1,5:1,1:2,6:2,2:3,7:3,3:4,8:4,4:5,9:5}
-MIRROR_PAIRS = {0:5,5:0,1:6,6:1,2:7,7:2,3:8,8:3,4:9,9:4}
-MIRROR = MIRROR_PAIRS
-mirror = MIRROR  # keep lowercase for CSV expressions
-MIRROR = MIRROR_PAIRS
-mirror = MIRROR
-V_TRAC = V_TRAC_GROUPS
-VTRAC_GROUPS = V_TRAC_GROUPS
-vtrac = V_TRAC_GROUPS
-
-def sum_category(total: int) -> str:
-    if 0 <= total <= 15:
-        return 'Very Low'
-    elif 16 <= total <= 24:
-        return 'Low'
-    elif 25 <= total <= 33:
-        return 'Mid'
-    else:
-        return 'High'
-
-def structure_of(digits):
-    counts = sorted(Counter(digits).values(), reverse=True)
-    if counts == [1,1,1,1,1]:
-        return 'SINGLE'
-    if counts == [2,1,1,1]:
-        return 'DOUBLE'
-    if counts == [2,2,1]:
-        return 'DOUBLE-DOUBLE'
-    if counts == [3,1,1]:
-        return 'TRIPLE'
-    if counts == [3,2]:
-        return 'TRIPLE-DOUBLE'
-    if counts == [4,1]:
-        return 'QUAD'
-    if counts == [5]:
-        return 'QUINT'
-    return f'OTHER-{counts}'
-
-def load_filters(path: str='lottery_filters_batch10.csv') -> list:
+import re
+import time
+import uuid
+
+from combo_space import BOX_TABLES, CHUNK_SIZE, box_space_size, generate_combinations, iter_combinations
+from filter_engine import (
+    ChunkedEvaluationJob, EvaluationJob, ShardedEvaluationJob, check_combos, elimination_trace,
+    dynamic_counts, make_gen_ctx,
+)
+from filter_loader import CompiledFilterFile
+from filter_analysis import marginal_values
+from trace_export import PARQUET_AVAILABLE, make_run_id, trace_tables, trace_zip, write_trace
+from shared_cache import LRUCache, hits_weight, pool_weight
+
+FILTER_FILE = 'lottery_filters_batch10.csv'
+TRACE_DIR = 'traces'
+STREAM_DIR = 'streams'
+# Above this many box combos the pool is generated and filtered in chunks
+MAX_INTERACTIVE_POOL = 25_000
+# Streamed survivor files larger than this are left on disk instead of offered for download
+MAX_DOWNLOAD_BYTES = 50_000_000
+# Bounds of the process-wide caches shared by all sessions
+SHARED_POOL_BYTES = 64 * 2**20
+SHARED_HITS_BYTES = 256 * 2**20
+
+@st.cache_resource
+def shared_caches() -> dict:
+    """Process-wide caches, shared read-only by every session."""
+    return {
+        'filter_files': LRUCache('filter_files', max_entries=8),
+        'pools': LRUCache('pools', max_weight=SHARED_POOL_BYTES, weigh=pool_weight),
+        'hits': LRUCache('hits', max_weight=SHARED_HITS_BYTES, weigh=hits_weight),
+    }
+
+
+def _prepare_filter(flt):
+    flt['enabled_default'] = (flt.get('enabled') or '').lower() == 'true'
+
+
+def load_filters(path: str=FILTER_FILE) -> tuple:
+    """Return ``(filters, repair_log, changes)``; every filter arrives with compiled code.
+
+    The compiled file is shared by all sessions and only re-read when it
+    changes on disk; then only added or edited rows are recompiled.
+    ``changes`` lists the ids added/modified/removed by a reload this rerun
+    (or the ``watch_filter_file`` check that started it) triggered, and is
+    None otherwise.
+    """
     if not os.path.exists(path):
         st.error(f"Filter file not found: {path}")
         st.stop()
-    filters = []
-    with open(path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for raw in reader:
-            row = {k.lower(): v for k, v in raw.items()}
-            row['id'] = row.get('id', row.get('fid', '')).strip()
-            for key in ('name', 'applicable_if', 'expression'):
-                if key in row and isinstance(row[key], str):
-                    row[key] = row[key].strip().strip('"').strip("'")
-            row['expression'] = row.get('expression', '').replace('!==', '!=')
-            applicable = row.get('applicable_if') or 'True'
-            expr = row.get('expression') or 'False'
-
-            # Some rows accidentally contain the literal string "applicable_if"
-            if str(applicable).strip().lower() in {"applicable_if", "none"}:
-                applicable = "True"
-                applicable_if = True  # avoid NameError in legacy rows
-
-            try:
-                row['applicable_code'] = compile(applicable, '<applicable>', 'eval')
-                row['expr_code'] = compile(expr, '<expr>', 'eval')
-            except SyntaxError as e:
-                st.error(f"Syntax error in filter {row['id']}: {e}")
-                continue
-            row['enabled_default'] = row.get('enabled', '').lower() == 'true'
-            filters.append(row)
-    return filters
-
-from itertools import product  # ensure this import is present at top
-
-def generate_combinations(seed: str, method: str, bucket_digits: str = "") -> list:
-    """
-    Generation methods:
-      - '1-digit'            : choose 1 of the original seed digits + 4 free digits
-      - '2-digit pair'       : choose a pair from the original seed digits + 3 free digits
-      - '1-digit (+1)'       : choose 1 of (seed digits +1 mod 10) + 4 free digits
-      - '2-digit pair (+1)'  : choose a pair from (seed digits +1 mod 10) + 3 free digits
-      - 'Bucket (1+4)'       : each bucket digit + any 4 digits (with repetition)
+    compiled = compiled_filter_file(path)
+    reloaded = compiled.refresh()
+    reloaded = st.session_state.pop('filters_reloaded', False) or reloaded
+    filters, repair_log, changes = compiled.snapshot()
+    return filters, repair_log, changes if reloaded else None
+
+
+def compiled_filter_file(path: str) -> CompiledFilterFile:
+    return shared_caches()['filter_files'].get_or_create(
+        path, lambda: CompiledFilterFile(path, prepare=_prepare_filter))
+
+
+@st.fragment(run_every=1)
+def watch_filter_file(path: str = FILTER_FILE):
+    """Check the filter file every second; rerun the whole app only when it changed."""
+    if os.path.exists(path) and compiled_filter_file(path).refresh():
+        st.session_state['filters_reloaded'] = True
+        st.rerun()
+
+
+def shared_pool(seed, method, bucket_input, pick_n, bucket_b) -> list:
+    """The generated pool, shared between sessions (do not mutate)."""
+    return shared_caches()['pools'].get_or_create(
+        (seed, method, bucket_input, bucket_b, pick_n),
+        lambda: generate_combinations(seed, method, bucket_input, pick_n, bucket_b))
+
+
+def cached_hits(pool_key, filters) -> list:
+    """``known`` results for this pool, by filter content hash (None = must evaluate)."""
+    cache = shared_caches()['hits']
+    return [cache.get((pool_key, flt['hash'])) for flt in filters]
+
+
+def remember_hits(pool_key, filters, hits, errors, offenders):
+    """Share finished bitmaps with every session looking at the same pool."""
+    cache = shared_caches()['hits']
+    for idx, flt in enumerate(filters):
+        if hits[idx] is not None and idx not in offenders:  # budget-dependent results are not reused
+            cache.put((pool_key, flt['hash']), (hits[idx], errors[idx]))
+
+
+def render_shared_cache_stats():
+    with st.sidebar.expander("Shared cache"):
+        stats = [cache.stats() for cache in shared_caches().values()]
+        stats.append(BOX_TABLES.stats())
+        st.dataframe(stats)
+
+def render_chunked_pool(filters, active, select_all, seed_runs, method, bucket_input, bucket_b, pick_n,
+                        job_key, batch_size: int = CHUNK_SIZE, stream_dir: str = None) -> bool:
+    """Stream pools through the filters in batches; returns True while running.
+
+    ``seed_runs`` is a list of ``(seed, seed_inputs)``.  Memory stays
+    O(batch); with ``stream_dir`` each job writes its survivors to a CSV of
+    its own there, which appears only once the job has finished.
     """
-    all_digits = '0123456789'
-    combos_set = set()
-
-    seed_only = ''.join(ch for ch in seed if ch.isdigit())
-    if len(seed_only) != 5:
-        seed_only = seed_only.zfill(5)
-    sorted_seed = ''.join(sorted(seed_only))
-    shifted = ''.join(str((int(d) + 1) % 10) for d in sorted_seed)
-
-    if method == '1-digit':
-        for d in sorted_seed:
-            for p in product(all_digits, repeat=4):
-                combos_set.add(''.join(sorted(d + ''.join(p))))
-
-    elif method == '2-digit pair':
-        pairs = {
-            ''.join(sorted((sorted_seed[i], sorted_seed[j])))
-            for i in range(len(sorted_seed)) for j in range(i + 1, len(sorted_seed))
-        }
-        for pair in pairs:
-            for p in product(all_digits, repeat=3):
-                combos_set.add(''.join(sorted(pair + ''.join(p))))
-
-    elif method == '1-digit (+1)':
-        for d in shifted:
-            for p in product(all_digits, repeat=4):
-                combos_set.add(''.join(sorted(d + ''.join(p))))
-
-    elif method == '2-digit pair (+1)':
-        pairs = {
-            ''.join(sorted((shifted[i], shifted[j])))
-            for i in range(len(shifted)) for j in range(i + 1, len(shifted))
-        }
-        for pair in pairs:
-            for p in product(all_digits, repeat=3):
-                combos_set.add(''.join(sorted(pair + ''.join(p))))
-
-    elif method == 'Bucket (1+4)':
-        raw = ''.join(ch for ch in (bucket_digits or '') if ch.isdigit())
-        bucket = ''.join(sorted(set(raw)))
-        if not bucket:
-            return []
-        for d in bucket:
-            for p in product(all_digits, repeat=4):
-                combos_set.add(''.join(sorted(d + ''.join(p))))
-    else:
-        raise ValueError(f"Unknown method: {method}")
+    job_key += (tuple(active), batch_size, stream_dir)
+    job = st.session_state.get('eval_job')
+    if job is None or job.key != job_key:
+        if job is not None:
+            job.cancel()
+        runs = [(s, iter_combinations(s, method, bucket_input, pick_n, batch_size, bucket_b), make_gen_ctx(inputs))
+                for s, inputs in seed_runs]
+        out_path = None
+        if stream_dir:
+            job_id = f"{make_run_id(seed_runs[0][0], method)}_{uuid.uuid4().hex[:8]}"
+            out_path = os.path.join(stream_dir, f"{job_id}_survivors.csv")
+        job = ChunkedEvaluationJob(job_key, runs, filters, active, out_path=out_path)
+        job.start()
+        st.session_state['eval_job'] = job
+    if job.error is not None:
+        st.error(f"Evaluation failed: {job.error}")
+    seen, n_survivors, sample, first_counts = job.snapshot()
+    running = not job.finished
+
+    st.info(f"Pick-{pick_n} pools ({box_space_size(pick_n):,} box combos per seed) are generated and "
+            f"filtered lazily in batches of {batch_size:,} (first-match counts only).")
+    so_far = " so far" if running else ""
+    st.sidebar.markdown(f"**Total{so_far}:** {seen:,}  Elim: {seen - n_survivors:,}  Remain: {n_survivors:,}")
+
+    st.header("🔧 Active Filters")
+    for idx, flt in enumerate(filters):
+        key = f"filter_{flt['id']}"
+        label = f"{flt['id']}: {flt['name']}"
+        if active[idx]:
+            label += f" — {first_counts[idx]} eliminated first"
+        st.checkbox(label, key=key, value=st.session_state.get(key, select_all and flt['enabled_default']))
 
-    return sorted(combos_set)
+    with st.expander(f"Show remaining combinations (first {len(sample):,})"):
+        for c in sample:
+            st.write(c)
+    if job.out_path:
+        if running:
+            st.caption(f"Writing survivors to {job.out_path} …")
+        elif job.saved:
+            size = os.path.getsize(job.out_path)
+            st.caption(f"Survivors written to {job.out_path} ({size:,} bytes)")
+            if size <= MAX_DOWNLOAD_BYTES:
+                with open(job.out_path, 'rb') as f:
+                    st.download_button("Download survivors (CSV)", f, file_name=os.path.basename(job.out_path),
+                                       mime="text/csv")
+    return running
+
+
+def render_hot_cold_due_calculator(n: int = 5):
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("Hot / Cold / Due Calculator")
+
+    calc_draws = []
+    for i in range(1, 11):
+        calc_draws.append(
+            st.sidebar.text_input(
+                f"Draw {i}-back (for calculator)",
+                key=f"calc_draw_{i}"
+            ).strip()
+        )
+
+    # >>> FIXED HOT/COLD/DUE LOGIC — ONLY THIS BLOCK CHANGED <<<
+    if all(len(d) == n and d.isdigit() for d in calc_draws):
+        # Count digit frequencies across the 10 reference draws
+        seq = "".join(calc_draws)
+        cnt_raw = Counter(int(ch) for ch in seq)
+
+        # Fill in zeros for digits that never appeared
+        counts_full = {d: cnt_raw.get(d, 0) for d in range(10)}
+
+        # HOT = exactly top-3 by frequency (ties broken by digit asc)
+        hot_sorted = sorted(counts_full.items(), key=lambda kv: (-kv[1], kv[0]))
+        auto_hot = sorted([d for d, _ in hot_sorted[:3]])
+
+        # COLD = exactly bottom-3 by frequency (ties broken by digit asc)
+        cold_sorted = sorted(counts_full.items(), key=lambda kv: (kv[1], kv[0]))
+        auto_cold = sorted([d for d, _ in cold_sorted[:3]])
+
+        # DUE = digits missing from the last TWO draws only
+        last2 = "".join(calc_draws[:2])  # 10-back and 9-back
+        seen_last2 = {int(x) for x in last2}
+        auto_due = sorted([d for d in range(10) if d not in seen_last2])
+
+        st.sidebar.write(f"**Hot:** {auto_hot}")
+        st.sidebar.write(f"**Cold:** {auto_cold}")
+        st.sidebar.write(f"**Due:** {auto_due}")
+    else:
+        st.sidebar.info(f"Enter all **10** past draws ({n} digits each) to calculate Hot/Cold/Due.")
+    # <<< END FIX >>>
 
 def main():
-    filters = load_filters()
+    filters, repair_log, changes = load_filters()
+    if changes and any(changes.values()):
+        st.toast(f"{FILTER_FILE} reloaded: " + ", ".join(
+            f"{len(ids)} {kind}" for kind, ids in changes.items() if ids))
+
+    rejected = [e for e in repair_log if e['action'] == 'rejected']
+    if rejected:
+        st.error(f"{len(rejected)} filter row(s) could not be repaired and were skipped (see repair log)")
+    if repair_log:
+        with st.expander(f"Filter repair log ({len(repair_log)} entries)"):
+            for e in repair_log:
+                st.text(f"row {e['row']} {e['id']} {e['field']}: {e['action']} {e['detail']}".rstrip())
 
     st.sidebar.header("🔢 DC-5 Filter Tracker Full")
     select_all = st.sidebar.checkbox("Select/Deselect All Filters", value=True)
@@ -167,207 +239,243 @@ def main():
         "Generation Method:",
         ["1-digit", "2-digit pair", "1-digit (+1)", "2-digit pair (+1)", "Bucket (1+4)", "Bucket A1 + B2 + AllBoxPairs"]
     )
+    pick_n = int(st.sidebar.number_input(
+        "Digits per combo (Pick-N):", min_value=2, max_value=20, value=5,
+        help="5 for DC-5; 3 or 4 for Pick-3/Pick-4. Draws must have this many digits."
+    ))
 
     hot_input = st.sidebar.text_input("Hot digits (comma-separated):").strip()
     cold_input = st.sidebar.text_input("Cold digits (comma-separated):").strip()
     due_input = st.sidebar.text_input("Due digits (comma-separated, optional):").strip()
-    bucket_input = st.sidebar.text_input("Bucket digits (for Bucket 1+4)", help="Enter digits 0–9 as 0138 or 0,1,3,8").strip()
+    bucket_input = st.sidebar.text_input("Bucket digits (for Bucket 1+4, or bucket A)", help="Enter digits 0–9 as 0138 or 0,1,3,8").strip()
+    bucket_b = st.sidebar.text_input(
+        "Bucket B digits (for A1 + B2)",
+        help="Box pairs (with repetition) of these digits are added to each bucket-A digit"
+    ).strip()
 
-    check_combo = st.sidebar.text_input("Check specific combo:").strip()
+    check_text = st.sidebar.text_area(
+        "Check combos:",
+        help="One or many combos, separated by spaces, commas or new lines"
+    )
+    check_file = st.sidebar.file_uploader("…or upload combos to check (.txt/.csv)", type=["txt", "csv"])
+    if check_file is not None:
+        check_text += "\n" + check_file.getvalue().decode("utf-8", errors="replace")
+    check_queries = [q for q in re.split(r'[\s,;]+', check_text) if q]
     hide_zero = st.sidebar.checkbox("Hide filters with 0 initial eliminations", value=True)
-
-    if len(seed) != 5 or not seed.isdigit():
-        st.sidebar.error("Draw 1-back must be exactly 5 digits")
+    show_marginal = st.sidebar.checkbox("Show marginal-value analysis", value=False)
+    watch_file = st.sidebar.checkbox(
+        "Watch filter file for edits", value=False,
+        help=f"Re-check {FILTER_FILE} every second; only edited rows are recompiled and re-evaluated"
+    )
+    if watch_file:
+        watch_filter_file()
+    exec_mode = st.sidebar.selectbox(
+        "Execution mode:",
+        ["Background thread", "Process pool (all cores, per-filter timeout)"],
+        help="Use the process pool for large or untrusted filter files"
+    )
+    filter_budget = st.sidebar.number_input("Per-filter time budget (s)", min_value=0.1, value=2.0, step=0.5)
+    stream_mode = st.sidebar.checkbox(
+        "Streaming mode (bounded memory)", value=False,
+        help="Generate and filter in batches and write survivors to a CSV as they are found"
+    )
+    if stream_mode:
+        extra_seeds_text = st.sidebar.text_area("More seeds to stream (one per line, optional):")
+        batch_size = int(st.sidebar.number_input("Batch size", min_value=1_000, value=CHUNK_SIZE, step=1_000))
+
+    if len(seed) != pick_n or not seed.isdigit():
+        st.sidebar.error(f"Draw 1-back must be exactly {pick_n} digits")
+        if 'eval_job' in st.session_state:
+            st.session_state.pop('eval_job').cancel()
         return
 
-    seed_digits = [int(d) for d in seed]
-    prev_digits = [int(d) for d in prev_seed if d.isdigit()]
-    prev_prev_digits = [int(d) for d in prev_prev if d.isdigit()]
-    prev_prev_prev_digits = [int(d) for d in prev_prev_prev if d.isdigit()]
-    new_digits = set(seed_digits) - set(prev_digits)
-    hot_digits = [int(x) for x in hot_input.split(',') if x.strip().isdigit()]
-    cold_digits = [int(x) for x in cold_input.split(',') if x.strip().isdigit()]
-
-    if due_input:
-        due_digits = [int(x) for x in due_input.split(',') if x.strip().isdigit()]
-    else:
-        due_digits = [d for d in range(10) if d not in prev_digits and d not in prev_prev_digits]
-
-    seed_counts = Counter(seed_digits)
-    seed_vtracs = set(V_TRAC_GROUPS[d] for d in seed_digits)
-    seed_sum = sum(seed_digits)
-    prev_pattern = []
-    for digs in (prev_prev_digits, prev_digits, seed_digits):
-        parity = 'Even' if sum(digs) % 2 == 0 else 'Odd'
-        prev_pattern.extend([sum_category(sum(digs)), parity])
-    prev_pattern = tuple(prev_pattern)
-
-    def gen_ctx(cdigits):
-        csum = sum(cdigits)
-        ctx = {
-            "seed_value": int(seed),
-            "seed_sum": seed_sum,
-            "prev_seed_sum": sum(prev_digits) if prev_digits else None,
-            "prev_prev_seed_sum": sum(prev_prev_digits) if prev_prev_digits else None,
-            "prev_prev_prev_seed_sum": sum(prev_prev_prev_digits) if prev_prev_prev_digits else None,
-
-            "seed_digits_1": prev_digits,
-            "seed_digits_2": prev_prev_digits,
-            "seed_digits_3": prev_prev_prev_digits,
-
-            "nan": float("nan"),
-
-            "seed_digits": seed_digits,
-            "prev_seed_digits": prev_digits,
-            "prev_prev_seed_digits": prev_prev_digits,
-            "prev_prev_prev_seed_digits": prev_prev_prev_digits,
-
-            "new_seed_digits": new_digits,
-            "prev_pattern": prev_pattern,
-
-            "hot_digits": hot_digits,
-            "cold_digits": cold_digits,
-            "due_digits": due_digits,
-
-            "seed_counts": seed_counts,
-            "combo_digits": cdigits,
-            "combo_sum": csum,
-            "combo_sum_cat": sum_category(csum),
-
-            "seed_vtracs": set(V_TRAC_GROUPS[d] for d in seed_digits),
-            "combo_vtracs": set(V_TRAC_GROUPS[d] for d in cdigits),
-
-            "common_to_both": set(seed_digits) & set(prev_digits),
-            "last2": set(seed_digits) | set(prev_digits),
-
-            "Counter": Counter,
-            "combo_structure": structure_of(cdigits),
-            "winner_structure": structure_of(seed_digits),
-
-            "MIRROR": MIRROR,
-            "mirror": MIRROR,
-            "MIRROR_PAIRS": MIRROR_PAIRS,
-
-            "V_TRAC_GROUPS": V_TRAC_GROUPS,
-            "VTRAC_GROUPS": V_TRAC_GROUPS,
-            "V_TRAC": V_TRAC_GROUPS,
-            "vtrac": V_TRAC_GROUPS,
-
-            "digit_prev_letters": {},
-            "digit_current_letters": {},
-            "prev_core_letters": set(),
-            "core_letters_prevmap": [],
-
-            "applicable_if": True,
-            "digit_prev_letters": {},
-            "digit_current_letters": {},
-            "prev_core_letters": set(),
-            "core_letters_prevmap": [],
-        }
-        return ctx
-
-    if method == 'Bucket (1+4)':
-        combos = generate_combinations(seed, method, bucket_input)
-    else:
-        combos = generate_combinations(seed, method)
-
-    eliminated = {}
-    survivors = []
-    for combo in combos:
-        cdigits = [int(c) for c in combo]
-        ctx = gen_ctx(cdigits)
-        for flt in filters:
-            key = f"filter_{flt['id']}"
-            if not st.session_state.get(key, select_all and flt['enabled_default']):
-                continue
-            try:
-                if not eval(flt['applicable_code'], ctx, ctx):
+    seed_inputs = {
+        "seed": seed,
+        "prev_digits": [int(d) for d in prev_seed if d.isdigit()],
+        "prev_prev_digits": [int(d) for d in prev_prev if d.isdigit()],
+        "prev_prev_prev_digits": [int(d) for d in prev_prev_prev if d.isdigit()],
+        "hot_digits": [int(x) for x in hot_input.split(',') if x.strip().isdigit()],
+        "cold_digits": [int(x) for x in cold_input.split(',') if x.strip().isdigit()],
+        "due_digits": [int(x) for x in due_input.split(',') if x.strip().isdigit()] if due_input else None,
+    }
+    gen_ctx = make_gen_ctx(seed_inputs)
+    active = [st.session_state.get(f"filter_{flt['id']}", select_all and flt['enabled_default'])
+              for flt in filters]
+    pool_key = (seed, prev_seed, prev_prev, prev_prev_prev, method, bucket_input, bucket_b, pick_n,
+                hot_input, cold_input, due_input)
+    job_key = pool_key + (tuple(flt['hash'] for flt in filters),)
+
+    if stream_mode or box_space_size(pick_n) > MAX_INTERACTIVE_POOL:
+        seed_runs = [(seed, seed_inputs)]
+        if stream_mode:
+            for extra in re.split(r'[\s,;]+', extra_seeds_text):
+                if not extra or extra == seed:
                     continue
-                if eval(flt['expr_code'], ctx, ctx):
-                    eliminated[combo] = flt['name']
-                    break
-            except:
-                continue
+                if len(extra) != pick_n or not extra.isdigit():
+                    st.sidebar.warning(f"Skipping seed {extra!r}: not {pick_n} digits")
+                    continue
+                seed_runs.append((extra, dict(seed_inputs, seed=extra)))
+            job_key += tuple(s for s, _ in seed_runs)
         else:
-            survivors.append(combo)
-
-    st.sidebar.markdown(f"**Total:** {len(combos)}  Elim: {len(eliminated)}  Remain: {len(survivors)}")
+            batch_size = CHUNK_SIZE
+        if check_queries:
+            st.sidebar.info("Combo checks need the full pool bitmaps and are not available "
+                            "in chunked/streaming mode")
+        if show_marginal:
+            st.sidebar.info("Marginal-value analysis is not available in chunked/streaming mode")
+        running = render_chunked_pool(filters, active, select_all, seed_runs, method, bucket_input, bucket_b,
+                                      pick_n, job_key, batch_size, STREAM_DIR if stream_mode else None)
+        render_hot_cold_due_calculator(pick_n)
+        render_shared_cache_stats()
+        if running:
+            time.sleep(0.3)
+            st.rerun()
+        return
 
-    if check_combo:
-        norm = ''.join(sorted(check_combo))
-        if norm in eliminated:
-            st.sidebar.info(f"Combo {check_combo} eliminated by {eliminated[norm]}")
-        elif norm in survivors:
-            st.sidebar.success(f"Combo {check_combo} survived all filters")
+    combos = shared_pool(seed, method, bucket_input, pick_n, bucket_b)
+
+    # ----- Evaluate in a worker thread; superseded runs are cancelled -----
+    job_key += (exec_mode, filter_budget)
+    job = st.session_state.get('eval_job')
+    if job is None or job.key != job_key:
+        if job is not None:
+            job.cancel()
+        known = cached_hits(pool_key, filters)
+        if exec_mode.startswith("Process pool"):
+            job = ShardedEvaluationJob(job_key, combos, filters, seed_inputs, budget=filter_budget,
+                                       known=known)
+        else:
+            job = EvaluationJob(job_key, combos, filters, gen_ctx, known)
+        job.start()
+        st.session_state['eval_job'] = job
+    if job.error is not None:
+        st.error(f"Evaluation failed: {job.error}")
+    done, hits, errors = job.snapshot()
+    running = not job.finished
+    # read after ``finished``: a filter's offender status is published before it counts as done
+    offenders = getattr(job, 'offenders', {})
+    if offenders:
+        st.warning(f"{len(offenders)} filter(s) timed out ({filter_budget}s budget), crashed or hung "
+                   "and were treated as not firing:")
+        for idx, status in sorted(offenders.items()):
+            st.text(f"{filters[idx]['id']}: {filters[idx]['name']} → {status}")
+    if not running and st.session_state.get('remembered_job') is not job:
+        remember_hits(pool_key, filters, hits, errors, offenders)
+        st.session_state['remembered_job'] = job
+
+    trace = elimination_trace(len(combos), hits, active)
+    survivors = [combo for combo, first in zip(combos, trace) if first < 0]
+    n_elim = len(combos) - len(survivors)
+
+    if running:
+        st.sidebar.progress(done / len(filters), text=f"Evaluating filters {done}/{len(filters)}…")
+        st.sidebar.markdown(f"**Total:** {len(combos)}  Elim so far: {n_elim}  Remain so far: {len(survivors)}")
+    else:
+        st.sidebar.markdown(f"**Total:** {len(combos)}  Elim: {n_elim}  Remain: {len(survivors)}")
+
+    # ----- Combo checks: answered from the pool bitmaps once evaluation is done -----
+    checks = []
+    if check_queries and running:
+        st.sidebar.info("Combo check will run when evaluation finishes")
+    elif len(check_queries) == 1:
+        checks = check_combos(check_queries, combos, filters, hits, errors, active, gen_ctx, pick_n)
+        c = checks[0]
+        if c['status'] == 'eliminated':
+            st.sidebar.info(f"Combo {c['combo']} eliminated by {c['eliminated_by']}")
+        elif c['status'] == 'survived':
+            st.sidebar.success(f"Combo {c['combo']} survived all filters")
         else:
             st.sidebar.warning("Combo not found in generated list")
+    elif check_queries:
+        checks = check_combos(check_queries, combos, filters, hits, errors, active, gen_ctx, pick_n)
+        status_counts = Counter(c['status'] for c in checks)
+        st.sidebar.markdown(f"**Checked:** {len(checks)}  " + "  ".join(
+            f"{status}: {n}" for status, n in status_counts.most_common()))
 
-    init_counts = {flt['id']: 0 for flt in filters}
-    for flt in filters:
-        for combo in combos:
-            cdigits = [int(c) for c in combo]
-            ctx = gen_ctx(cdigits)
-            try:
-                if eval(flt['applicable_code'], ctx, ctx) and eval(flt['expr_code'], ctx, ctx):
-                    init_counts[flt['id']] += 1
-            except:
-                pass
-
-    sorted_filters = sorted(filters, key=lambda flt: (init_counts[flt['id']] == 0, -init_counts[flt['id']]))
+    init_counts = [bits.bit_count() if bits is not None else 0 for bits in hits]
+    order = sorted(range(len(filters)), key=lambda i: (init_counts[i] == 0, -init_counts[i]))
 
     if hide_zero:
-        display_filters = [flt for flt in sorted_filters if init_counts[flt['id']] > 0]
-    else:
-        display_filters = sorted_filters
+        # pending filters stay listed so their checkbox state survives the rerun
+        order = [i for i in order if init_counts[i] > 0 or hits[i] is None]
 
-    st.markdown(f"**Initial Manual Filters Count:** {len(display_filters)}")
+    st.markdown(f"**Initial Manual Filters Count:** {len(order)}")
 
-    pool = list(combos)
-    dynamic_counts = {}
-    for flt in display_filters:
-        key = f"filter_{flt['id']}"
-        active = st.session_state.get(key, select_all and flt['enabled_default'])
-        dc = 0
-        survivors_pool = []
-        if active:
-            for combo in pool:
-                cdigits = [int(c) for c in combo]
-                ctx = gen_ctx(cdigits)
-                try:
-                    if eval(flt['applicable_code'], ctx, ctx) and eval(flt['expr_code'], ctx, ctx):
-                        dc += 1
-                    else:
-                        survivors_pool.append(combo)
-                except:
-                    survivors_pool.append(combo)
-        else:
-            survivors_pool = pool.copy()
-        dynamic_counts[flt['id']] = dc
-        pool = survivors_pool
+    dyn_counts = dynamic_counts(order, hits, active, len(combos))
 
     st.header("🔧 Active Filters")
-    for flt in display_filters:
+    for i in order:
+        flt = filters[i]
         key = f"filter_{flt['id']}"
-        ic = init_counts[flt['id']]
-        dc = dynamic_counts.get(flt['id'], 0)
-        label = f"{flt['id']}: {flt['name']} — {dc}/{ic} eliminated"
+        if hits[i] is None:
+            label = f"{flt['id']}: {flt['name']} — evaluating…"
+        else:
+            label = f"{flt['id']}: {flt['name']} — {dyn_counts[i]}/{init_counts[i]} eliminated"
         st.checkbox(label, key=key, value=st.session_state.get(key, select_all and flt['enabled_default']))
 
-    with st.expander("Show remaining combinations"):
-        for c in survivors:
-            st.write(c)
+    if show_marginal and not running:
+        st.header("📊 Marginal Value")
+        st.caption("Unique = combos only this filter eliminates; least useful enabled filters first.")
+        rows = marginal_values(hits, active, len(combos))
+        rows.sort(key=lambda r: (r['unique'], r['hits']))
+        st.dataframe([
+            {
+                "id": filters[r['idx']]['id'],
+                "name": filters[r['idx']]['name'],
+                "eliminates": r['hits'],
+                "unique": r['unique'],
+                "survivors if off": r['survivors_if_off'],
+                "most similar": ", ".join(
+                    f"{filters[j]['id']} ({overlap}, J={jac:.2f})" for j, overlap, jac in r['similar']
+                ),
+            }
+            for r in rows
+        ])
 
-    if check_combo:
-        test_digits = [int(c) for c in check_combo if c.isdigit()]
-        ctx = gen_ctx(test_digits)
-        triggered = []
-        failed = []
-        for flt in filters:
-            try:
-                if eval(flt['applicable_code'], ctx, ctx) and eval(flt['expr_code'], ctx, ctx):
-                    triggered.append(flt['id'])
-            except Exception as e:
-                failed.append((flt['id'], f"{flt['name']} → {e}"))
+    with st.expander("Show remaining combinations"):
+        if running:
+            st.caption("Evaluation still running; the list will appear when it finishes.")
+        else:
+            for c in survivors:
+                st.write(c)
+
+    if not running:
+        with st.expander("💾 Export elimination trace"):
+            include_bitmaps = st.checkbox("Include full per-filter hit bitmaps", value=False)
+            # built on request and kept for this result; reruns (e.g. file watching) reuse it
+            export_key = (job.key, tuple(active), include_bitmaps)
+            export = st.session_state.get('trace_export')
+            if export is not None and export['key'] != export_key:
+                export = st.session_state['trace_export'] = None
+            formats = ["csv"] + (["parquet"] if PARQUET_AVAILABLE else [])
+            if export is None and st.button("Prepare export"):
+                run_id = make_run_id(seed, method)
+                run_meta = {
+                    "run_id": run_id, "seed": seed, "prev_seed": prev_seed, "prev_prev_seed": prev_prev,
+                    "prev_prev_prev_seed": prev_prev_prev, "method": method, "bucket": bucket_input,
+                    "bucket_b": bucket_b, "hot": hot_input, "cold": cold_input, "due": due_input,
+                    "filter_file": FILTER_FILE,
+                }
+                tables = trace_tables(run_meta, combos, trace, filters, hits, active, include_bitmaps)
+                export = st.session_state['trace_export'] = {
+                    'key': export_key, 'run_id': run_id, 'tables': tables,
+                    'zips': {fmt: trace_zip(tables, run_id, fmt) for fmt in formats},
+                }
+            if export is not None:
+                run_id = export['run_id']
+                for fmt, data in export['zips'].items():
+                    st.download_button(f"Download trace ({fmt.upper()}, zip)", data,
+                                       file_name=f"{run_id}_trace_{fmt}.zip", mime="application/zip")
+                if st.button(f"Save trace to {TRACE_DIR}/"):
+                    paths = write_trace(TRACE_DIR, export['tables'], run_id, formats[-1])
+                    st.success("Saved " + ", ".join(paths))
+            if not PARQUET_AVAILABLE:
+                st.caption("Install pyarrow to enable Parquet export.")
+
+    if len(checks) == 1:
+        names = {flt['id']: flt['name'] for flt in filters}
+        triggered = checks[0]['triggered']
+        failed = checks[0]['errors']
 
         st.subheader("⚡ Filter Diagnostics")
         st.write(f"Triggered filters: {len(triggered)} / {len(filters)}")
@@ -376,48 +484,28 @@ def main():
         st.write(f"Filters failed (error → automatically returned False): {len(failed)}")
         if failed:
             for fid, msg in failed:
-                st.text(f"{fid}: {msg}")
-
-    st.sidebar.markdown("---")
-    st.sidebar.subheader("Hot / Cold / Due Calculator")
-
-    calc_draws = []
-    for i in range(1, 11):
-        calc_draws.append(
-            st.sidebar.text_input(
-                f"Draw {i}-back (for calculator)",
-                key=f"calc_draw_{i}"
-            ).strip()
-        )
-
-    # >>> FIXED HOT/COLD/DUE LOGIC — ONLY THIS BLOCK CHANGED <<<
-    if all(len(d) == 5 and d.isdigit() for d in calc_draws):
-        # Count digit frequencies across the 10 reference draws
-        seq = "".join(calc_draws)
-        cnt_raw = Counter(int(ch) for ch in seq)
-
-        # Fill in zeros for digits that never appeared
-        counts_full = {d: cnt_raw.get(d, 0) for d in range(10)}
-
-        # HOT = exactly top-3 by frequency (ties broken by digit asc)
-        hot_sorted = sorted(counts_full.items(), key=lambda kv: (-kv[1], kv[0]))
-        auto_hot = sorted([d for d, _ in hot_sorted[:3]])
-
-        # COLD = exactly bottom-3 by frequency (ties broken by digit asc)
-        cold_sorted = sorted(counts_full.items(), key=lambda kv: (kv[1], kv[0]))
-        auto_cold = sorted([d for d, _ in cold_sorted[:3]])
-
-        # DUE = digits missing from the last TWO draws only
-        last2 = "".join(calc_draws[:2])  # 10-back and 9-back
-        seen_last2 = {int(x) for x in last2}
-        auto_due = sorted([d for d in range(10) if d not in seen_last2])
-
-        st.sidebar.write(f"**Hot:** {auto_hot}")
-        st.sidebar.write(f"**Cold:** {auto_cold}")
-        st.sidebar.write(f"**Due:** {auto_due}")
-    else:
-        st.sidebar.info("Enter all **10** past draws (5 digits each) to calculate Hot/Cold/Due.")
-    # <<< END FIX >>>
+                st.text(f"{fid}: {names[fid]} → {msg}")
+    elif checks:
+        st.subheader("⚡ Filter Diagnostics")
+        st.dataframe([
+            {
+                "combo": c['combo'],
+                "status": c['status'],
+                "eliminated by": c['eliminated_by'],
+                "triggered": len(c['triggered']),
+                "triggered filters": ", ".join(c['triggered']),
+                "erroring filters": ", ".join(fid for fid, _ in c['errors']),
+            }
+            for c in checks
+        ])
+
+    render_hot_cold_due_calculator(pick_n)
+    render_shared_cache_stats()
+
+    # Poll the worker: the next rerun picks up more finished filters
+    if running:
+        time.sleep(0.3)
+        st.rerun()
 
 if __name__ == '__main__':
     main()
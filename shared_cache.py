@@ -0,0 +1,103 @@
+# shared_cache.py
+"""Bounded, thread-safe LRU caches shared by every session of a process (no Streamlit imports).
+
+Streamlit runs each browser session as a thread of one process, so a cache
+held at module level (or behind ``st.cache_resource``) is shared by all
+analysts.  Values are treated as read-only once stored.  Each cache is
+bounded by entry count and/or a total weight (approximate bytes) and keeps
+hit/miss/eviction counters for the UI.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Least-recently-used mapping with optional entry and weight bounds.
+
+    ``weigh(value)`` returns the weight charged for a value (default 1);
+    the least recently used entries are evicted until both bounds hold.
+    """
+
+    def __init__(self, name: str, max_entries: int = None, max_weight: int = None, weigh=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 1)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.weight = 0
+        self._data = OrderedDict()  # key -> (value, weight)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        w = self.weigh(value)
+        with self._lock:
+            if self.max_weight is not None and w > self.max_weight:
+                return  # never worth evicting everything for one value
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.weight -= old[1]
+            self._data[key] = (value, w)
+            self.weight += w
+            while ((self.max_entries is not None and len(self._data) > self.max_entries)
+                   or (self.max_weight is not None and self.weight > self.max_weight)):
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.weight -= evicted
+                self.evictions += 1
+
+    def get_or_create(self, key, factory):
+        """Cached value for ``key``, building it with ``factory()`` on a miss.
+
+        ``factory`` runs outside the lock, so two threads missing at once may
+        both build; the last one stored wins and both results are equal.
+        """
+        marker = object()
+        value = self.get(key, marker)
+        if value is marker:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'cache': self.name,
+                'entries': len(self._data),
+                'weight': self.weight,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+            }
+
+
+def hits_weight(value) -> int:
+    """Approximate bytes of a ``(hits, errors)`` bitmap pair."""
+    hits, errors = value
+    return 64 + ((hits or 0).bit_length() + (errors or 0).bit_length()) // 8
+
+
+def pool_weight(combos) -> int:
+    """Approximate bytes of a list of combo strings."""
+    return sys.getsizeof(combos) + sum(sys.getsizeof(c) for c in combos[:1]) * len(combos)
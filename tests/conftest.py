@@ -0,0 +1,8 @@
+# conftest.py
+"""The modules under test live at the repo root; make them importable."""
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
@@ -0,0 +1,125 @@
+# test_combo_space.py
+"""Pools from combo_space checked against brute-force enumeration."""
+import random
+from itertools import chain, product
+
+import pytest
+
+from combo_space import (ALL_DIGITS, box_space_size, generate_combinations, iter_box_space,
+                         iter_combinations, method_multisets)
+
+BASELINE_METHODS = ['1-digit', '2-digit pair', '1-digit (+1)', '2-digit pair (+1)', 'Bucket (1+4)']
+
+
+def baseline_generate_combinations(seed: str, method: str, bucket_digits: str = "") -> list:
+    """The product() generator the app shipped with, frozen as the reference."""
+    all_digits = '0123456789'
+    combos_set = set()
+
+    seed_only = ''.join(ch for ch in seed if ch.isdigit())
+    if len(seed_only) != 5:
+        seed_only = seed_only.zfill(5)
+    sorted_seed = ''.join(sorted(seed_only))
+    shifted = ''.join(str((int(d) + 1) % 10) for d in sorted_seed)
+
+    if method == '1-digit':
+        for d in sorted_seed:
+            for p in product(all_digits, repeat=4):
+                combos_set.add(''.join(sorted(d + ''.join(p))))
+
+    elif method == '2-digit pair':
+        pairs = {
+            ''.join(sorted((sorted_seed[i], sorted_seed[j])))
+            for i in range(len(sorted_seed)) for j in range(i + 1, len(sorted_seed))
+        }
+        for pair in pairs:
+            for p in product(all_digits, repeat=3):
+                combos_set.add(''.join(sorted(pair + ''.join(p))))
+
+    elif method == '1-digit (+1)':
+        for d in shifted:
+            for p in product(all_digits, repeat=4):
+                combos_set.add(''.join(sorted(d + ''.join(p))))
+
+    elif method == '2-digit pair (+1)':
+        pairs = {
+            ''.join(sorted((shifted[i], shifted[j])))
+            for i in range(len(shifted)) for j in range(i + 1, len(shifted))
+        }
+        for pair in pairs:
+            for p in product(all_digits, repeat=3):
+                combos_set.add(''.join(sorted(pair + ''.join(p))))
+
+    elif method == 'Bucket (1+4)':
+        raw = ''.join(ch for ch in (bucket_digits or '') if ch.isdigit())
+        bucket = ''.join(sorted(set(raw)))
+        if not bucket:
+            return []
+        for d in bucket:
+            for p in product(all_digits, repeat=4):
+                combos_set.add(''.join(sorted(d + ''.join(p))))
+    else:
+        raise ValueError(f"Unknown method: {method}")
+
+    return sorted(combos_set)
+
+
+def brute_force_a1_b2(bucket_a: str, bucket_b: str, n: int) -> list:
+    """One A digit + two B digits (with repetition) + every choice of the other n-3 digits."""
+    if n < 3:
+        return []
+    return sorted({
+        ''.join(sorted(a + b1 + b2 + ''.join(rest)))
+        for a in set(bucket_a) for b1 in set(bucket_b) for b2 in set(bucket_b)
+        for rest in product(ALL_DIGITS, repeat=n - 3)
+    })
+
+
+def _random_digits(rng, k):
+    return ''.join(rng.choice(ALL_DIGITS) for _ in range(k))
+
+
+def _cases(count=50, rng_seed=20240501):
+    rng = random.Random(rng_seed)
+    return [(_random_digits(rng, 5), _random_digits(rng, rng.randint(0, 6))) for _ in range(count)]
+
+
+@pytest.mark.parametrize('method', BASELINE_METHODS)
+def test_matches_baseline_generator(method):
+    for seed, bucket in _cases():
+        expected = baseline_generate_combinations(seed, method, bucket)
+        assert generate_combinations(seed, method, bucket) == expected, (seed, bucket)
+        streamed = list(chain.from_iterable(iter_combinations(seed, method, bucket, chunk_size=997)))
+        assert streamed == expected, (seed, bucket)
+
+
+def test_short_seeds_are_zero_padded():
+    assert generate_combinations('12', '1-digit') == baseline_generate_combinations('12', '1-digit')
+
+
+@pytest.mark.parametrize('n', [2, 3, 4, 5])
+def test_a1_b2_matches_brute_force(n):
+    rng = random.Random(n)
+    cases = [('', '12'), ('3', ''), ('0', '0'), ('0123456789', '0123456789')]
+    cases += [(_random_digits(rng, rng.randint(1, 4)), _random_digits(rng, rng.randint(1, 4)))
+              for _ in range(20)]
+    method = 'Bucket A1 + B2 + AllBoxPairs'
+    for bucket_a, bucket_b in cases:
+        expected = brute_force_a1_b2(bucket_a, bucket_b, n)
+        got = generate_combinations('12345', method, bucket_a, n=n, bucket_b=bucket_b)
+        assert got == expected, (bucket_a, bucket_b)
+        streamed = list(chain.from_iterable(
+            iter_combinations('12345', method, bucket_a, n=n, chunk_size=50, bucket_b=bucket_b)))
+        assert streamed == expected, (bucket_a, bucket_b)
+
+
+def test_box_space_is_every_sorted_combo():
+    for n in (1, 2, 3):
+        space = list(iter_box_space(n))
+        assert space == sorted({''.join(sorted(p)) for p in product(ALL_DIGITS, repeat=n)})
+        assert len(space) == box_space_size(n)
+
+
+def test_unknown_method_raises():
+    with pytest.raises(ValueError):
+        method_multisets('12345', 'Bucket (2+3)')
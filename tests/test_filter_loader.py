@@ -0,0 +1,117 @@
+# test_filter_loader.py
+"""Repair pipeline checks against hand-written cells and the shipped filter CSVs."""
+import os
+
+import pytest
+
+from filter_loader import compile_filter_file, compile_filter_rows, repair_source
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _compiled(name):
+    return compile_filter_file(os.path.join(REPO_ROOT, name))
+
+
+def _entries(log, fid):
+    return [(e['field'], e['action']) for e in log if e['id'] == fid]
+
+
+def _by_id(filters, fid):
+    return next(flt for flt in filters if flt['id'] == fid)
+
+
+# --- repair_source, one repair at a time ---
+
+@pytest.mark.parametrize('src, default, fixed, fixes', [
+    ('"""True"""', 'True', 'True', ['unwrapped quoted expression']),
+    ('"combo_sum == 1"', 'False', 'combo_sum == 1', ['unwrapped quoted expression']),
+    ('applicable_if', 'True', 'True', ["placeholder 'applicable_if' -> True"]),
+    ('', 'False', 'False', []),
+    ('combo_sum !== 10', 'False', 'combo_sum != 10', ["'!==' -> '!='"]),
+    ('seed_sum == 08', 'False', 'seed_sum == 8', ['leading-zero int literals']),
+    ('"combo_sum < 20""', 'False', 'combo_sum < 20', ['stripped stray outer quotes']),
+    ('combo_sum_cat != \'Low', 'False', "combo_sum_cat != 'Low'", ['closed unterminated string']),
+])
+def test_repair_source(src, default, fixed, fixes):
+    assert repair_source(src, default) == (fixed, fixes)
+
+
+def test_repairs_stop_once_source_parses():
+    # 0.5 must survive: the leading-zero fix never runs on valid code
+    assert repair_source('combo_sum > 0.5', 'False') == ('combo_sum > 0.5', [])
+    # '!==' alone is enough; the later fixes are not tried
+    assert repair_source('x !== 1', 'False') == ('x != 1', ["'!==' -> '!='"])
+
+
+def test_quotes_inside_valid_code_are_kept():
+    # the legacy strip('"').strip("'") turned this into  combo_sum_cat != 'Low
+    src = "combo_sum_cat != 'Low'"
+    assert repair_source(src, 'False') == (src, [])
+
+
+# --- the shipped CSV rows that need each repair ---
+
+def test_triple_quoted_cells_are_unwrapped():
+    filters, log = _compiled('lottery_filters_batcherrors.csv')
+    flt = _by_id(filters, 'F001')
+    assert (flt['applicable_src'], flt['expr_src']) == ('True', 'combo_sum == 1')
+    assert ('expression', 'unwrapped quoted expression') in _entries(log, 'F001')
+
+
+def test_stray_outer_quotes_in_shipped_rows():
+    filters, log = _compiled('lottery_filters_batch10_CLEAN.csv')
+    for fid, expr in (('NVR290F200', 'any(d == mirror.get(seed_sum % 10, -1) for d in combo_digits)'),
+                      ('22F357', 'prev_seed_sum > 20 and seed_sum < 20 and combo_sum < 20')):
+        assert _by_id(filters, fid)['expr_src'] == expr
+        assert _entries(log, fid) == [('expression', 'stripped stray outer quotes')]
+
+    filters, log = _compiled('lottery_filters_batch10.csv')
+    assert _by_id(filters, 'NOOSEEDMIRREP')['applicable_src'] == 'True'
+    assert _entries(log, 'NOOSEEDMIRREP') == [('applicable_if', 'stripped stray outer quotes')]
+
+
+def test_low_closing_quote_is_kept():
+    filters, log = _compiled('lottery_filters_batch10_CLEAN.csv')
+    assert _by_id(filters, '0F358')['expr_src'] == "combo_sum_cat != 'Low'"
+    assert _entries(log, '0F358') == []
+
+
+def test_unterminated_applicable_if_is_closed():
+    filters, log = _compiled('lottery_filters_batcherrors.csv')
+    for fid in ('F550S', 'F551S'):
+        assert _by_id(filters, fid)['applicable_src'] == 'structure == "Single"'
+        assert _entries(log, fid) == [('applicable_if', 'closed unterminated string')]
+
+
+def test_repeated_header_row_is_skipped():
+    filters, log = _compiled('lottery_filters_batch10.csv')
+    skipped = [e for e in log if e['action'] == 'skipped']
+    assert [(e['id'], e['detail']) for e in skipped] == [('id', 'repeated header row')]
+    assert all(flt['id'].lower() != 'id' for flt in filters)
+
+
+def test_ctx_rows_stay_rejected():
+    filters, log = _compiled('2lottery_filters_batch10.csv')
+    ids = {flt['id'] for flt in filters}
+    for fid in ('NO101F189', 'NO172F550S'):
+        assert fid not in ids
+        assert _entries(log, fid)[-1] == ('expression', 'rejected')
+        rejected = next(e for e in log if e['id'] == fid and e['action'] == 'rejected')
+        assert 'ctx[' in rejected['detail']
+
+
+def test_escaped_quote_rows_are_rejected():
+    filters, log = _compiled('lottery_filters_batch10alt.csv')
+    ids = {flt['id'] for flt in filters}
+    assert {'0F358', '0F359'}.isdisjoint(ids)
+    assert [e['id'] for e in log if e['action'] == 'rejected'] == ['0F358', '0F359']
+
+
+def test_rows_reuse_compiled_entries():
+    rows = [{'id': 'F1', 'name': 'x', 'applicable_if': 'True', 'expression': 'combo_sum == 1'}]
+    compiled = {}
+    first, _ = compile_filter_rows(rows, compiled)
+    second, _ = compile_filter_rows([dict(r) for r in rows], compiled)
+    assert first[0] is second[0]
+    assert first[0]['hash'] == second[0]['hash']
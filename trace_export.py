@@ -0,0 +1,119 @@
+# trace_export.py
+"""Columnar export of the compact elimination trace (no Streamlit imports).
+
+A run is written as three tables that share a ``run_id`` column, so many
+days of runs can be concatenated and loaded without re-running filters:
+
+  runs     one row per run: seed inputs, method, pool size, survivors
+  pool     one row per pool slot: combo and first eliminating filter (-1 = survived)
+  filters  one row per filter: id, name, active, hit count, optional hit bitmap
+
+Bitmaps are hex strings of the per-filter hit ints (bit ``i`` = pool slot ``i``).
+CSV needs nothing extra; Parquet needs ``pyarrow``.
+"""
+import csv
+import io
+import os
+import zipfile
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
+
+PARQUET_AVAILABLE = pa is not None
+
+TRACE_TABLES = ('runs', 'pool', 'filters')
+
+
+def make_run_id(seed: str, method: str, when: datetime = None) -> str:
+    """``<timestamp>_<seed>_<method>``; sorts chronologically across days."""
+    when = when or datetime.now()
+    return f"{when:%Y%m%d-%H%M%S}_{seed}_{''.join(ch for ch in method if ch.isalnum())}"
+
+
+def trace_tables(run_meta: dict, combos, trace, filters, hits, active,
+                 include_bitmaps: bool = False) -> dict:
+    """Build ``{table: {column: values}}`` for one run.
+
+    ``run_meta`` must contain ``run_id``; its other keys become columns of
+    the ``runs`` table.  ``trace`` is the ``array('h')`` from
+    ``filter_engine.elimination_trace``.
+    """
+    run_id = run_meta['run_id']
+    n = len(combos)
+    runs = {key: [value] for key, value in run_meta.items()}
+    runs['pool_size'] = [n]
+    runs['survivors'] = [sum(1 for first in trace if first < 0)]
+
+    pool = {
+        'run_id': [run_id] * n,
+        'slot': list(range(n)),
+        'combo': list(combos),
+        'first_filter': trace.tolist(),
+    }
+
+    filter_table = {
+        'run_id': [run_id] * len(filters),
+        'filter_idx': list(range(len(filters))),
+        'id': [flt['id'] for flt in filters],
+        'name': [flt['name'] for flt in filters],
+        'active': [bool(on) for on in active],
+        'hits': [bits.bit_count() if bits is not None else None for bits in hits],
+    }
+    if include_bitmaps:
+        filter_table['hit_bitmap'] = [format(bits, 'x') if bits is not None else None for bits in hits]
+    return {'runs': runs, 'pool': pool, 'filters': filter_table}
+
+
+def table_to_csv(columns: dict) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    writer.writerows(zip(*columns.values()))
+    return out.getvalue().encode('utf-8')
+
+
+def table_to_parquet(columns: dict) -> bytes:
+    if pa is None:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+    table = pa.table(columns)
+    if 'first_filter' in columns:
+        # keep the trace column as compact on disk as it is in memory
+        table = table.set_column(table.schema.get_field_index('first_filter'), 'first_filter',
+                                 table.column('first_filter').cast(pa.int16()))
+    out = io.BytesIO()
+    pq.write_table(table, out)
+    return out.getvalue()
+
+
+_WRITERS = {'csv': table_to_csv, 'parquet': table_to_parquet}
+
+
+def trace_zip(tables: dict, run_id: str, fmt: str = 'csv') -> bytes:
+    """All tables of one run as a zip (``<run_id>_<table>.<fmt>`` members)."""
+    write = _WRITERS[fmt]
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name in TRACE_TABLES:
+            zf.writestr(f"{run_id}_{name}.{fmt}", write(tables[name]))
+    return out.getvalue()
+
+
+def write_trace(out_dir: str, tables: dict, run_id: str, fmt: str = 'csv') -> list:
+    """Write each table to ``out_dir/<table>/<run_id>.<fmt>``; returns the paths.
+
+    One directory per table means a whole history loads with a single glob
+    (or as a Parquet dataset).
+    """
+    write = _WRITERS[fmt]
+    paths = []
+    for name in TRACE_TABLES:
+        os.makedirs(os.path.join(out_dir, name), exist_ok=True)
+        path = os.path.join(out_dir, name, f"{run_id}.{fmt}")
+        with open(path, 'wb') as f:
+            f.write(write(tables[name]))
+        paths.append(path)
+    return paths